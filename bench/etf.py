@@ -0,0 +1,53 @@
+"""
+Decode throughput of ETF (etf.decode) against JSON (json.loads, and orjson if installed),
+on gateway payloads stored in bench/payloads as both encodings (READY, MESSAGE_CREATE, GUILD_MEMBERS_CHUNK).
+The payloads have the shape of recorded ones, with made up ids and names. In ETF, snowflakes are integers
+Run from the repository root: python bench/etf.py
+"""
+
+import os
+import sys
+import json
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src import etf
+
+PAYLOADS = os.path.join(os.path.dirname(__file__), "payloads")
+NAMES = ("ready", "message_create", "guild_members_chunk")
+
+decoders = {"json.loads": json.loads, "etf.decode": etf.decode}
+try:
+    import orjson
+    decoders["orjson.loads"] = orjson.loads
+except ImportError:
+    pass
+
+
+def bench(decoder, data: bytes, seconds: float = 0.5) -> float:
+    """
+    Returns amount of decoded payloads per second
+    """
+
+    number = 1
+    while True:
+        elapsed = timeit.timeit(lambda: decoder(data), number=number)
+        if elapsed >= seconds:
+            return number / elapsed
+        number *= 2
+
+
+def main():
+    print(f"{'payload':<22}{'decoder':<14}{'size':>10}{'payloads/s':>13}{'MB/s':>9}")
+    for name in NAMES:
+        for decoder_name, decoder in decoders.items():
+            extension = "etf" if decoder_name.startswith("etf") else "json"
+            with open(os.path.join(PAYLOADS, f"{name}.{extension}"), "rb") as file:
+                data = file.read()
+            rate = bench(decoder, data)
+            print(f"{name:<22}{decoder_name:<14}{len(data):>10}{rate:>13.0f}{rate * len(data) / 1e6:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Send latency of the pooled HTTPClient against the original way of sending messages
+(`requests.post` in a thread, without a session => new connection for every request).
+Starts a local stand-in server, and times sequential POSTs with both clients.
+Run from the repository root: python bench/http_client.py [amount of requests] [handshake delay in ms]
+The handshake delay is added to every new connection, to simulate TCP + TLS setup to a remote server
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.http_client import HTTPClient
+
+try:
+    import requests
+except ImportError:
+    requests = None
+
+
+async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, handshake: float):
+    """
+    Answers every request with a small JSON body, keeping the connection alive
+    """
+
+    try:
+        await asyncio.sleep(handshake)
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            length = 0
+            while (header := await reader.readline()) != b"\r\n":
+                name, _, value = header.decode("latin-1").partition(":")
+                if name.lower() == "content-length":
+                    length = int(value)
+            await reader.readexactly(length)
+            body = json.dumps({"id": "1", "content": "hello"}).encode()
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                         b"Content-Length: %d\r\n\r\n%s" % (len(body), body))
+            await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+        # connections left open by the clients are cancelled when the benchmark ends
+        pass
+    writer.close()
+
+
+def percentile(samples: list[float], percent: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * percent / 100))]
+
+
+def report(name: str, samples: list[float]):
+    print(
+        f"{name:<28}p50 {percentile(samples, 50) * 1000:7.2f}ms   "
+        f"p99 {percentile(samples, 99) * 1000:7.2f}ms   total {sum(samples):.2f}s")
+
+
+async def main(amount: int, handshake: float):
+    server = await asyncio.start_server(lambda r, w: handle(r, w, handshake), "127.0.0.1", 0)
+    url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/api/v9/channels/1/messages"
+    payload = {"content": "benchmark message"}
+    headers = {"Authorization": "token"}
+
+    # before: requests.post in a thread
+    if requests is None:
+        print("requests is not installed, skipping the baseline")
+    else:
+        samples = []
+        for _ in range(amount):
+            started = time.perf_counter()
+            await asyncio.to_thread(requests.post, url=url, json=payload, headers=headers)
+            samples.append(time.perf_counter() - started)
+        report("requests.post in thread", samples)
+
+    # after: pooled client
+    client = HTTPClient()
+    samples = []
+    for _ in range(amount):
+        started = time.perf_counter()
+        response = await client.request("POST", url, json=payload, headers=headers)
+        response.json()
+        samples.append(time.perf_counter() - started)
+    report("HTTPClient (pooled)", samples)
+    print(f"{client.connections_opened} connections opened, {client.connections_reused} reused")
+    await client.close()
+
+    server.close()
+    await server.wait_closed()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+        float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.0))
@@ -0,0 +1,106 @@
+"""
+Memory used by User, Member, Channel and Message objects, before and after the slotted models.
+Builds N objects of each type from the recorded payloads (bench/payloads), and measures retained
+bytes per object with tracemalloc. Every object is built from freshly decoded JSON, so it owns its
+strings and ints, like the objects built from gateway events.
+The "before" models are src/types.py from a git revision (the first commit by default).
+Run from the repository root: python bench/models.py [amount of objects] [git revision]
+"""
+
+import os
+import sys
+import json
+import types
+import subprocess
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src import types as current
+
+PAYLOADS = os.path.join(os.path.dirname(__file__), "payloads")
+
+
+def load_revision(revision: str) -> types.ModuleType:
+    """
+    Loads src/types.py from the git revision as a module of the src package
+    """
+
+    source = subprocess.run(
+        ["git", "show", f"{revision}:src/types.py"],
+        capture_output=True, text=True, check=True, cwd=os.path.dirname(PAYLOADS)).stdout
+    module = types.ModuleType("src.types_" + revision)
+    module.__package__ = "src"
+    exec(compile(source, f"{revision}:src/types.py", "exec"), module.__dict__)
+    return module
+
+
+def first_commit() -> str:
+    return subprocess.run(
+        ["git", "rev-list", "--max-parents=0", "HEAD"],
+        capture_output=True, text=True, check=True, cwd=os.path.dirname(PAYLOADS)).stdout.split()[0]
+
+
+def samples() -> dict[str, str]:
+    """
+    One JSON sample of every measured object
+    """
+
+    with open(os.path.join(PAYLOADS, "guild_members_chunk.json")) as file:
+        member = json.load(file)["d"]["members"][0]
+    with open(os.path.join(PAYLOADS, "ready.json")) as file:
+        channel = json.load(file)["d"]["guilds"][0]["channels"][0]
+    with open(os.path.join(PAYLOADS, "message_create.json")) as file:
+        message = json.load(file)["d"]
+    return {
+        "user": json.dumps(member["user"]),
+        "member": json.dumps(member),
+        "channel": json.dumps(channel),
+        "message": json.dumps(message)}
+
+
+def build(module: types.ModuleType, kind: str, text: str, author) -> object:
+    raw = json.loads(text)
+    if kind == "user":
+        return module.User(**raw)
+    if kind == "member":
+        # member owns its user; roles are shared with the guild, so they aren't counted
+        return module.Member(user=module.User(**raw["user"]), nick=raw["nick"], roles=[])
+    if kind == "channel":
+        return module.Channel(**raw)
+    # message author is a cached user, so it isn't counted. Mentions aren't resolved
+    # by from_create_event (yet), so they are left out like there
+    raw["author"] = author
+    for key in ("mentions", "mention_roles", "attachments"):
+        raw.pop(key)
+    return module.Message(**raw)
+
+
+def measure(module: types.ModuleType, kind: str, text: str, amount: int) -> float:
+    """
+    Returns retained bytes per object
+    """
+
+    author = module.User(id="1", username="author")
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [build(module, kind, text, author) for _ in range(amount)]
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del objects
+    return retained / amount
+
+
+def main(amount: int, revision: str):
+    baseline = load_revision(revision)
+    print(f"{amount} objects of every type, before = {revision[:10]}")
+    for kind, text in samples().items():
+        old = measure(baseline, kind, text, amount)
+        new = measure(current, kind, text, amount)
+        print(f"{kind:<10}before {old:7.0f} B   after {new:7.0f} B   {new / old:6.1%}")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 10000,
+        sys.argv[2] if len(sys.argv) > 2 else first_commit())
@@ -0,0 +1,75 @@
+"""
+Micro-benchmark of formatting.character_wrap against the original implementation
+(which built its output with `new_string += char`, one character at a time).
+Run from the repository root: python bench/wrap.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.formatting import character_wrap
+
+
+def baseline_wrap(string: str, width=120) -> str:
+    """
+    Original character_wrap (only the read past the end of the string is fixed, so it doesn't raise)
+    """
+
+    is_esc = False
+    line_len = 0
+    new_string = ""
+    for idx, char in enumerate(string):
+        new_string += char
+        line_len += 1 if not is_esc else 0
+
+        # newline
+        if char == "\n":
+            line_len = 0
+
+        # escape character
+        elif char == "\33":
+            is_esc = True
+
+        # when we found end of escape sequence
+        elif char in "mHKJ" and is_esc:
+            is_esc = False
+            line_len -= 1
+
+        elif line_len >= width and idx + 1 < len(string) and string[idx+1] != "\n":
+            new_string += "\n"
+            line_len = 0
+    return new_string
+
+
+INPUTS = {
+    "ascii": ("The quick brown fox jumps over the lazy dog. " * 40 + "\n") * 3,
+    "emoji/cjk": ("漢字とかなの混じった文章 😀🎉 emoji 👍🏽 and 中文字符 " * 30 + "\n") * 3,
+    "ansi": ("\33[1mbold\33[0m \33[38;2;255;0;0mred\33[0m \33[3mitalic\33[0m plain " * 40 + "\n") * 3,
+}
+
+
+def bench(function, text: str, width: int, number: int) -> float:
+    """
+    Returns average time of one call in microseconds
+    """
+
+    return timeit.timeit(lambda: function(text, width), number=number) / number * 1e6
+
+
+def main():
+    number = 500
+    width = 80
+    uncached = character_wrap.__wrapped__
+    print(f"{'input':<12}{'chars':>8}{'baseline':>12}{'new':>12}{'new cached':>12}{'speedup':>10}")
+    for name, text in INPUTS.items():
+        before = bench(baseline_wrap, text, width, number)
+        after = bench(uncached, text, width, number)
+        cached = bench(character_wrap, text, width, number)
+        print(f"{name:<12}{len(text):>8}{before:>10.1f}us{after:>10.1f}us{cached:>10.2f}us{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@ from src import Client
 from src import Terminal
 from src import format_message
 from src import Message
+from src import Capabilities
 
 
 # parser
@@ -18,13 +19,50 @@ parser.add_argument("--auth",
                     default=os.getenv("DISCORD_AUTH"), required=False)
 parser.add_argument("-d", "--debug",
                     help="debug terminal", action="store_true")
+parser.add_argument("--compress",
+                    help="use zlib-stream gateway compression", action="store_true")
+parser.add_argument("--encoding",
+                    help="gateway encoding", choices=["json", "etf"], default="json")
+parser.add_argument("--overload",
+                    help="what to do with events when the event queue is full",
+                    choices=["block", "drop", "coalesce"], default=Client.overload_policy)
+parser.add_argument("--capabilities",
+                    help="gateway capabilities bitmask sent in IDENTIFY", type=int, default=int(Client.capabilities))
+parser.add_argument("--subscribed-channels",
+                    help="amount of recently focused guild channels kept subscribed (op 14)",
+                    type=int, default=Client.subscriptions.max_channels)
+parser.add_argument("--scrollback",
+                    help="max amount of lines kept in scrollback", type=int, default=Terminal.max_lines)
+parser.add_argument("--scrollback-bytes",
+                    help="max amount of bytes kept in scrollback", type=int, default=None)
+parser.add_argument("--spill",
+                    help="file to which lines evicted from scrollback are appended", default=None)
+parser.add_argument("--store",
+                    help="local message store (SQLite database)",
+                    default=os.path.join(os.path.expanduser("~"), ".headless-discord", "messages.db"))
+parser.add_argument("--no-store",
+                    help="don't keep messages in the local store", action="store_true")
 args = parser.parse_args()
 
+# event queue
+Client.overload_policy = args.overload
+
+# gateway
+Client.capabilities = Capabilities(args.capabilities)
+Client.subscriptions.max_channels = args.subscribed_channels
+
+# terminal scrollback
+Terminal.max_lines = args.scrollback
+Terminal.max_bytes = args.scrollback_bytes
+Terminal.spill_path = args.spill
+
 
 def main():
     cli = Client()
     if args.auth:
-        cli.run(args.auth)
+        cli.run(
+            args.auth, compress=args.compress, encoding=args.encoding,
+            store=None if args.no_store else args.store)
     else:
         raise Exception("No authentication token was given, use \33[1;31mpython3 main.py --help\33[0m to get help")
 
@@ -52,6 +90,7 @@ def debug():
 
         await asyncio.gather(
             terminal.start_listening(),
+            terminal.start_rendering(),
             while_true())
 
     try:
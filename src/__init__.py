@@ -1,5 +1,6 @@
 from .types import *
 from .client import Client
+from .dispatch import Dispatcher
 from .terminal import Terminal
 from .formatting import *
 from .constants import *
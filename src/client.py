@@ -1,11 +1,34 @@
+import re
 import json
+import time
+import zlib
 import asyncio
-import requests
 import websockets
 from typing import Any
 from random import random
+from datetime import datetime
 from .types import *
 from .terminal import Terminal
+from .metrics import RollingWindow, RateCounter
+from .http_client import HTTPClient, HTTPResponse
+from .rest import RestScheduler
+from .storage import MessageStore
+from .dispatch import Dispatcher
+from .subscriptions import SubscriptionManager
+from . import etf
+from . import snowflake
+
+# faster json backend, if installed
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+
+# gateway payload header: {"t":...,"s":...,"op":...,"d":
+_HEADER_RE = re.compile(r'\{"t":(?:null|"(\w+)"),"s":(null|\d+),"op":(\d+),"d":')
+_HEADER_RE_BYTES = re.compile(_HEADER_RE.pattern.encode("ascii"))
 
 
 class Client:
@@ -16,10 +39,96 @@ class Client:
     # connection
     _auth: str | None = None
     _sock: websockets.WebSocketClientProtocol | None = None
+    _encoding: str = "json"                 # gateway encoding, "json" or "etf"
+    _compress: bool = False
+    _inflator = None
+
+    # identify
+    capabilities: Capabilities = Capabilities(16381)    # everything except NO_AFFINE_USER_IDS
+
+    # transport statistics
+    event_rate: RateCounter = RateCounter()             # gateway payloads per second
+    byte_rate: RateCounter = RateCounter()              # bytes received from the gateway per second
+    bytes_received: int = 0                 # bytes received from the gateway (compressed, if compression is on)
+    bytes_decompressed: int = 0             # bytes after decompression
+    events_decoded: dict[str, int] = {}     # amount of fully decoded events, by type
+    events_skipped: dict[str, int] = {}     # amount of events with skipped body decoding, by type
+    bytes_skipped: int = 0                  # amount of bytes in skipped event bodies
+
+    # event handlers
+    events: Dispatcher = Dispatcher(
+        error_callback=lambda handler, exc: Terminal.log(
+            f"event handler {getattr(handler, '__qualname__', handler)} failed: {exc!r}"))
+
+    # events which bodies are decoded (the ones that have handlers). Bodies of other dispatch events are skipped
+    subscribed_events: set[str] = events.event_types
+
+    # event queue (between the gateway reader and event processing)
+    event_queue_size: int = 1000
+    overload_policy: str = "block"          # when the queue is full: "block", "drop" (low priority events) or "coalesce"
+    low_priority_events: set[str] = {"TYPING_START", "PRESENCE_UPDATE"}
+    coalesce_keys: dict[str, Any] = {       # event type -> function returning what the event is about
+        "TYPING_START": lambda data: (data.get("channel_id"), data.get("user_id")),
+        "PRESENCE_UPDATE": lambda data: data.get("user", {}).get("id")}
+    _event_queue: asyncio.Queue | None = None
+    _coalesced: dict[tuple, tuple[float, dict]] = {}    # coalesce key -> (receive time, newest event)
+
+    # event queue statistics
+    events_dropped: int = 0
+    events_coalesced: int = 0
+    max_queue_depth: int = 0
+    queue_lag: RollingWindow = RollingWindow(1000)      # event received -> event processing started (seconds)
 
     # keep alive
     _heartbeat_interval: int = 41250
     _sequence: int | None = None
+    _heartbeat_acked: bool = True
+    _heartbeat_sent_at: float | None = None
+    gateway_latency: RollingWindow = RollingWindow(1000)  # heartbeat -> heartbeat ACK (seconds)
+
+    # session (for resuming)
+    _session_id: str | None = None
+    _resume_gateway_url: str | None = None
+    _closing: bool = False                  # connection is being closed by the user
+    reconnect_delay: float = 1.0            # base reconnect delay in seconds, doubles after every failed attempt
+    max_reconnect_delay: float = 60.0
+    _reconnect_attempt: int = 0
+    _disconnected_at: float | None = None
+    _resume_sent_at: float | None = None
+
+    # reconnect statistics
+    reconnects: int = 0
+    resume_latency: RollingWindow = RollingWindow()      # RESUME sent -> RESUMED received (seconds)
+    reconnect_latency: RollingWindow = RollingWindow()   # connection lost -> session ready again (seconds)
+
+    # REST
+    http: HTTPClient = HTTPClient(user_agent=USER_AGENT)
+    rest: RestScheduler = RestScheduler(http)
+
+    # message history
+    history_page_size: int = 50             # messages per history page (max 100)
+    prefetch_channels: int = 5              # amount of channels which history is prefetched after READY
+    prefetch_concurrency: int = 2           # max amount of channels prefetched at the same time
+    _prefetched: dict[int, list[Message]] = {}          # channel id -> first history page (newest first)
+    _history_pages = None                   # history generator of the focused channel
+    _history_loading: bool = False
+    _read_states: dict[int, int] = {}       # channel id -> id of the last read message
+
+    # local message store (None if disabled)
+    store: MessageStore | None = None
+    search_page_size: int = 10              # search results per page
+
+    # lazy guild subscriptions (op 14)
+    subscriptions: SubscriptionManager = SubscriptionManager(lambda payload: Client._send_subscription(payload))
+
+    # guild members
+    member_request_delay: float = 0.5       # member requests are collected for that long, then sent together (op 8)
+    _member_requests: dict[int, set[int]] = {}          # guild id -> user ids waiting to be requested
+    _members_requested: set[tuple[int, int]] = set()    # (guild id, user id) requested, but not received yet
+    _member_flush: asyncio.Task | None = None
+
+    # READY hydration
+    hydration_chunk_size: int = 200         # amount of objects built before yielding to the event loop
 
     # discord
     user: ClientUser | None = None
@@ -31,8 +140,58 @@ class Client:
         """
 
         response = await cls._sock.recv()
+        cls.bytes_received += len(response)
+        cls.byte_rate.add(len(response))
+
+        # zlib-stream: payload may be split into multiple frames, the last one ends with Z_SYNC_FLUSH suffix
+        if cls._compress:
+            buffer = bytearray(response)
+            while not buffer.endswith(ZLIB_SUFFIX):
+                response = await cls._sock.recv()
+                cls.bytes_received += len(response)
+                cls.byte_rate.add(len(response))
+                buffer += response
+            response = cls._inflator.decompress(buffer)
+            cls.bytes_decompressed += len(response)
+
         if response:
-            return json.loads(response)
+            cls.event_rate.add()
+            return cls._decode(response)
+
+    @classmethod
+    def _decode(cls, response: str | bytes) -> Any:
+        """
+        Decodes gateway payload. For JSON, payload header is read first,
+        and the body is only decoded if someone is subscribed to that event type
+        """
+
+        if cls._encoding == "etf":
+            payload = etf.decode(response)
+            if payload.get("t"):
+                cls.events_decoded[payload["t"]] = cls.events_decoded.get(payload["t"], 0) + 1
+            return payload
+
+        # check the header
+        header_re = _HEADER_RE_BYTES if isinstance(response, (bytes, bytearray)) else _HEADER_RE
+        header = header_re.match(response)
+        event_type = header.group(1) if header else None
+        if isinstance(event_type, bytes):
+            # compressed payloads are inflated to bytes
+            event_type = event_type.decode("ascii")
+        if event_type and event_type not in cls.subscribed_events:
+            cls.events_skipped[event_type] = cls.events_skipped.get(event_type, 0) + 1
+            cls.bytes_skipped += len(response) - header.end()
+            sequence = header.group(2)
+            return {
+                "t": event_type,
+                "s": int(sequence) if sequence != "null" and sequence != b"null" else None,
+                "op": int(header.group(3)),
+                "d": None}
+
+        payload = json_loads(response)
+        if payload.get("t"):
+            cls.events_decoded[payload["t"]] = cls.events_decoded.get(payload["t"], 0) + 1
+        return payload
 
     @classmethod
     async def send_request(cls, request: Any):
@@ -40,90 +199,274 @@ class Client:
         Sends a request to connected socket
         """
 
-        await cls._sock.send(json.dumps(request))
+        if cls._encoding == "etf":
+            await cls._sock.send(etf.encode(request))
+        else:
+            await cls._sock.send(json.dumps(request))
 
     @classmethod
-    async def send_post_request(cls, **kwargs):
+    async def api_request(cls, method: str, endpoint: str, **kwargs) -> HTTPResponse:
         """
-        Sends POST API request
+        Sends REST API request
+        :param method: HTTP method
+        :param endpoint: API endpoint (f.e. "/channels/{id}/messages")
+        :param kwargs: arguments for `HTTPClient.request` (json, params, headers, ...)
         """
 
-        # append authorization header is missing
-        if "headers" not in kwargs:
-            kwargs["headers"] = {}
-        if "Authorization" not in kwargs["headers"]:
-            kwargs["headers"]["Authorization"] = cls._auth
+        # append authorization header if missing
+        headers = kwargs.setdefault("headers", {})
+        if "Authorization" not in headers:
+            headers["Authorization"] = cls._auth
 
-        return await asyncio.to_thread(requests.post, **kwargs)
+        return await cls.rest.request(method, f"{API}{endpoint}", endpoint, **kwargs)
 
     @classmethod
-    def run(cls, token: str) -> None:
+    def gateway_url(cls, url: str = GATEWAY) -> str:
+        """
+        Returns gateway url with connection parameters
+        """
+
+        url = f"{url.rstrip('/')}/?v={GATEWAY_VERSION}&encoding={cls._encoding}"
+        if cls._compress:
+            url += "&compress=zlib-stream"
+        return url
+
+    @classmethod
+    def run(cls, token: str, compress: bool = False, encoding: str = "json", store: str | None = None) -> None:
         """
         Connects the client
+        :param token: discord token
+        :param compress: use zlib-stream transport compression
+        :param encoding: gateway encoding, "json" or "etf"
+        :param store: path of the local message store (None to disable it)
         """
 
         async def coro():
-            async with websockets.connect(GATEWAY) as websock:
-                cls._sock = websock
-                cls._heartbeat_interval = (await cls.get_request())['d']['heartbeat_interval']
-                Terminal.log("connection successful")
-                await cls.send_request(
-                    {
-                        "op": 2,
-                        "d": {
-                            "token": cls._auth,
-                            "capabilities": 16381,
-                            "properties": {
-                                "os": "Windows",
-                                "browser": "Chrome",
-                                "device": "",
-                                "system_locale": "en-US",
-                                "browser_user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-                                                      "(KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36",
-                                "browser_version": "123.0.0.0",
-                                "os_version": "10",
-                                "referrer": "https://search.brave.com/",
-                                "referring_domain": "search.brave.com",
-                                "referrer_current": "",
-                                "referring_domain_current": "",
-                                "release_channel": "stable",
-                                "client_build_number": 281369,
-                                "client_event_source": None
-                            }
-                        }
-                    }
-                )
-                Terminal.log("authentication successful")
-                Terminal.input_callback = process_user_input
-                await asyncio.gather(
-                    cls._keep_alive(),
-                    cls._event_handle(),
-                    Terminal.start_listening()
-                )
+            Terminal.input_callback = process_user_input
+            Terminal.scroll_top_callback = cls.load_older_history
+            cls._event_queue = asyncio.Queue(cls.event_queue_size)
+            await asyncio.gather(
+                cls._connection_loop(),
+                cls._process_events(),
+                Terminal.start_listening(),
+                Terminal.start_rendering()
+            )
         cls._auth = token
+        cls._compress = compress
+        cls._encoding = encoding
+        if store:
+            cls.store = MessageStore(store)
         Terminal.clear_terminal()
         Terminal.log("attempting connection")
         try:
             asyncio.run(coro())
         except KeyboardInterrupt:
             pass
-        except websockets.exceptions.ConnectionClosedOK:
+        except websockets.exceptions.ConnectionClosed:
             pass
-        except OSError:
-            Terminal.log("connection failed")
+        finally:
+            if cls.store is not None:
+                cls.store.close()
         Terminal.log("connection closed")
 
+    @classmethod
+    async def _connection_loop(cls):
+        """
+        Keeps the client connected. Reconnects with jittered exponential backoff,
+        resuming the session if possible
+        """
+
+        while True:
+            try:
+                await cls._connect()
+            except websockets.exceptions.ConnectionClosed as exc:
+                if cls._closing:
+                    raise
+                code = exc.rcvd.code if exc.rcvd else None
+
+                # authentication failed / bad intents etc. => reconnecting won't help
+                if code in GATEWAY_FATAL_CLOSE_CODES:
+                    Terminal.log(f"connection closed by discord ({code})")
+                    raise
+
+                # session can't be resumed
+                if code in GATEWAY_SESSION_CLOSE_CODES:
+                    cls._session_id = None
+                    cls._sequence = None
+            except websockets.exceptions.WebSocketException as exc:
+                # rejected handshake (f.e. HTTP 5xx during an outage)
+                Terminal.log(f"connection failed ({exc})")
+            except OSError:
+                Terminal.log("connection failed")
+
+            # wait before reconnecting
+            if cls._disconnected_at is None:
+                cls._disconnected_at = time.perf_counter()
+            delay = min(cls.max_reconnect_delay, cls.reconnect_delay * 2 ** cls._reconnect_attempt)
+            delay *= 0.5 + random()
+            cls._reconnect_attempt += 1
+            Terminal.log(f"connection lost, reconnecting in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    @classmethod
+    async def _connect(cls):
+        """
+        Connects to the gateway, and processes events until the connection is closed
+        """
+
+        url = cls._resume_gateway_url if cls._session_id and cls._resume_gateway_url else GATEWAY
+        async with websockets.connect(cls.gateway_url(url), max_size=None) as websock:
+            cls._sock = websock
+            cls._inflator = zlib.decompressobj()
+            cls._heartbeat_interval = (await cls.get_request())['d']['heartbeat_interval']
+            cls._heartbeat_acked = True
+            Terminal.log("connection successful")
+
+            # resume the session if there is one, otherwise identify
+            if cls._session_id:
+                await cls._send_resume()
+            else:
+                await cls._send_identify()
+
+            keep_alive = asyncio.create_task(cls._keep_alive())
+            try:
+                await cls._event_handle()
+            finally:
+                keep_alive.cancel()
+
+    @classmethod
+    async def _send_identify(cls):
+        """
+        Sends IDENTIFY (starts new session)
+        """
+
+        await cls.send_request(
+            {
+                "op": 2,
+                "d": {
+                    "token": cls._auth,
+                    "capabilities": int(cls.capabilities),
+                    "properties": {
+                        "os": "Windows",
+                        "browser": "Chrome",
+                        "device": "",
+                        "system_locale": "en-US",
+                        "browser_user_agent": USER_AGENT,
+                        "browser_version": "123.0.0.0",
+                        "os_version": "10",
+                        "referrer": "https://search.brave.com/",
+                        "referring_domain": "search.brave.com",
+                        "referrer_current": "",
+                        "referring_domain_current": "",
+                        "release_channel": "stable",
+                        "client_build_number": 281369,
+                        "client_event_source": None
+                    }
+                }
+            }
+        )
+        Terminal.log("authentication successful")
+
+    @classmethod
+    async def _send_resume(cls):
+        """
+        Sends RESUME (replays events missed since last sequence number)
+        """
+
+        cls._resume_sent_at = time.perf_counter()
+        await cls.send_request(
+            {
+                "op": 6,
+                "d": {
+                    "token": cls._auth,
+                    "session_id": cls._session_id,
+                    "seq": cls._sequence
+                }
+            }
+        )
+        Terminal.log("resuming session")
+
+    @classmethod
+    async def _send_subscription(cls, payload: dict):
+        """
+        Sends subscription update. Skipped when disconnected (subscriptions are sent again after READY)
+        """
+
+        if cls._sock is None or not cls._sock.open:
+            return
+        try:
+            await cls.send_request(payload)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
     @classmethod
     async def _event_handle(cls):
         """
-        Processes discord gateway sent events
+        Reads discord gateway sent events. Control ops (heartbeats, reconnects) are handled right away,
+        dispatch events are queued for processing, so slow handlers don't stall the socket
         """
 
         while True:
             response = await cls.get_request()
             cls._sequence = response["s"] if response["s"] else cls._sequence
 
-            await cls._process_event(response)
+            if response["op"] != 0:
+                await cls.events.dispatch(response)
+            elif response["t"] in cls.subscribed_events:
+                await cls._enqueue_event(response)
+
+    @classmethod
+    async def _enqueue_event(cls, event: dict):
+        """
+        Puts the event into the event queue, applying the overload policy
+        """
+
+        received_at = time.perf_counter()
+        event_type = event["t"]
+
+        # coalesce: only the newest event about the same thing waits in the queue
+        key = None
+        if cls.overload_policy == "coalesce" and event_type in cls.coalesce_keys:
+            key = (event_type, cls.coalesce_keys[event_type](event["d"]))
+            if key in cls._coalesced:
+                cls._coalesced[key] = (cls._coalesced[key][0], event)
+                cls.events_coalesced += 1
+                return
+            cls._coalesced[key] = (received_at, event)
+            event = None
+
+        # drop: low priority events are dropped when the queue is full
+        elif cls.overload_policy == "drop" and cls._event_queue.full() and event_type in cls.low_priority_events:
+            cls.events_dropped += 1
+            return
+
+        await cls._event_queue.put((received_at, event, key))
+        cls.max_queue_depth = max(cls.max_queue_depth, cls._event_queue.qsize())
+
+    @classmethod
+    async def _process_events(cls):
+        """
+        Processes queued events
+        """
+
+        while True:
+            received_at, event, key = await cls._event_queue.get()
+            if key is not None:
+                received_at, event = cls._coalesced.pop(key)
+            cls.queue_lag.add(time.perf_counter() - received_at)
+            await cls.events.dispatch(event)
+
+    @classmethod
+    def _session_ready(cls):
+        """
+        Called when session is (re)established. Records reconnect latency
+        """
+
+        if cls._disconnected_at is not None:
+            cls.reconnect_latency.add(time.perf_counter() - cls._disconnected_at)
+            cls.reconnects += 1
+        cls._disconnected_at = None
+        cls._reconnect_attempt = 0
 
     @classmethod
     async def _keep_alive(cls):
@@ -138,6 +481,12 @@ class Client:
         # keep alive
         while cls._sock.open:
             await asyncio.sleep(cls._heartbeat_interval / 1000)
+
+            # last heartbeat was not acknowledged => zombie connection
+            if not cls._heartbeat_acked:
+                Terminal.log("heartbeat was not acknowledged, reconnecting")
+                await cls._sock.close(code=4000)
+                return
             await cls._send_heartbeat()
 
     @classmethod
@@ -146,14 +495,280 @@ class Client:
         Sends heartbeat to gateway
         """
 
+        cls._heartbeat_acked = False
+        cls._heartbeat_sent_at = time.perf_counter()
         await cls.send_request({"op": 1, "d": cls._sequence})
 
+    @classmethod
+    async def _fetch_page(cls, channel_id: str, **params) -> list[dict] | None:
+        """
+        Fetches one page of raw messages (newest first), and writes them to the store,
+        together with the history range that is now complete. Returns None if the request failed
+        :param channel_id: channel id
+        :param params: query parameters (before, after, ...)
+        """
+
+        params["limit"] = cls.history_page_size
+        response = await cls.api_request("GET", f"/channels/{channel_id}/messages", params=params)
+        if not response.ok:
+            Terminal.log(f"unable to fetch message history ({response.status} {response.reason})")
+            return None
+
+        page = response.json() or []
+        if cls.store is not None and page:
+            guild = ClientUser.get_channel_guild(channel_id)
+            for raw in page:
+                cls.store.add(raw, guild_id=guild.id if guild else None)
+
+        # pages are continuous: from the cursor to the last message of the page (or to the channel start)
+        if cls.store is not None:
+            ids = [int(raw["id"]) for raw in page]
+            if "after" in params:
+                if ids:
+                    cls.store.add_range(channel_id, params["after"], max(ids))
+            elif ids or "before" in params:
+                last_id = params["before"] if "before" in params else max(ids)
+                first_id = min(ids) if len(ids) >= cls.history_page_size else 0
+                cls.store.add_range(channel_id, first_id, last_id)
+        return page
+
+    @classmethod
+    async def fetch_history(cls, channel_id: str, before: str | None = None):
+        """
+        Fetches message history of the channel page by page, newest messages first.
+        Pages are loaded from the store while it has complete history, the rest is requested
+        :param channel_id: channel id
+        :param before: fetch messages before this message id
+        """
+
+        while True:
+            page = []
+            if cls.store is not None and before is not None:
+                page = await cls.store.load(channel_id, cls.history_page_size, before)
+            stored = bool(page)
+            if not stored:
+                page = await cls._fetch_page(channel_id, **({"before": before} if before else {}))
+                if not page:
+                    return
+            yield [Message.from_create_event(raw) for raw in page]
+            if not stored and len(page) < cls.history_page_size:
+                return
+            before = page[-1]["id"]
+
+    @classmethod
+    def request_members(cls, guild: Guild, user_ids):
+        """
+        Queues guild members to be requested from the gateway (op 8).
+        Requests are batched, cached and already requested members are skipped
+        """
+
+        pending = None
+        for uid in user_ids:
+            if guild.get_member(uid) is None and (guild.id, uid) not in cls._members_requested:
+                cls._members_requested.add((guild.id, uid))
+                pending = cls._member_requests.setdefault(guild.id, set())
+                pending.add(uid)
+        if pending and cls._member_flush is None:
+            cls._member_flush = asyncio.create_task(cls._flush_member_requests())
+
+    @classmethod
+    async def _flush_member_requests(cls):
+        """
+        Sends queued member requests, up to 100 users per request.
+        Members that couldn't be requested (disconnected) can be requested again later
+        """
+
+        await asyncio.sleep(cls.member_request_delay)
+        requests, cls._member_requests = cls._member_requests, {}
+        cls._member_flush = None
+        for guild_id, user_ids in requests.items():
+            user_ids = list(user_ids)
+            for start in range(0, len(user_ids), 100):
+                chunk = user_ids[start:start + 100]
+                sent = False
+                if cls._sock is not None and cls._sock.open:
+                    try:
+                        await cls.send_request({
+                            "op": 8,
+                            "d": {
+                                "guild_id": str(guild_id),
+                                "user_ids": [str(uid) for uid in chunk],
+                                "presences": False}})
+                        sent = True
+                    except websockets.exceptions.ConnectionClosed:
+                        pass
+                if not sent:
+                    cls._members_requested.difference_update((guild_id, uid) for uid in chunk)
+
+    @classmethod
+    def _request_authors(cls, channel: Channel, messages: list[Message]):
+        """
+        Resolves message authors to cached members, and requests the ones that aren't cached
+        (history has no member info). Requested members are shown once they arrive
+        """
+
+        if channel.guild is None:
+            return
+        for message in messages:
+            if isinstance(message.author, User):
+                message.author = channel.guild.get_member(message.author.id) or message.author
+        cls.request_members(channel.guild, {
+            message.author.id for message in messages if isinstance(message.author, User)})
+
+    @classmethod
+    async def fetch_delta(cls, channel_id: str, after: str) -> list[Message] | None:
+        """
+        Fetches messages newer than `after`, oldest first.
+        Returns None if more than one page is missing (stored history is too old to be completed)
+        :param channel_id: channel id
+        :param after: id of the newest known message
+        """
+
+        page = await cls._fetch_page(channel_id, after=after)
+        if page is None:
+            return []
+        if len(page) >= cls.history_page_size:
+            return None
+        page.sort(key=lambda raw: int(raw["id"]))
+        return [Message.from_create_event(raw) for raw in page]
+
+    @classmethod
+    def set_focus(cls, channel: Channel):
+        """
+        Focuses the channel, and starts loading its recent history
+        """
+
+        ClientUser.focus_channel = channel
+        Terminal.clear_messages()
+        asyncio.create_task(cls.subscriptions.focus(channel))
+        asyncio.create_task(cls._show_history(channel))
+
+    @classmethod
+    async def _show_history(cls, channel: Channel):
+        """
+        Shows recent history of the channel.
+        Newest complete stored history is shown right away, then only messages newer than it are fetched
+        """
+
+        # use stored history, and complete it with newer messages
+        if cls.store is not None and channel.id not in cls._prefetched:
+            cached = await cls.store.load(channel.id, cls.history_page_size)
+            if ClientUser.focus_channel is not channel:
+                return
+            if cached:
+                page = [Message.from_create_event(raw) for raw in cached]
+                cls._request_authors(channel, page)
+                Terminal.prepend_messages(page[::-1])
+                cls._history_pages = cls.fetch_history(channel.id, before=page[-1].id)
+
+                # stored history reaches the last message (ids are ordered by creation time) => nothing to fetch.
+                # Last message id of guild channels is only current if they stayed subscribed
+                synced = channel.guild is None or cls.subscriptions.is_synced(channel.id)
+                if synced and channel.last_message_id is not None and page[0].id >= channel.last_message_id:
+                    return
+
+                delta = await cls.fetch_delta(channel.id, page[0].id)
+                if delta is not None:
+                    # newer messages are received as events from now on
+                    newest = delta[-1].id if delta else page[0].id
+                    channel.last_message_id = max(channel.last_message_id or 0, newest)
+                    cls.subscriptions.observe(channel.id)
+                if ClientUser.focus_channel is not channel:
+                    return
+                if delta is not None:
+                    for message in delta:
+                        Terminal.print_message(message)
+                    return
+
+                # too many messages are missing => start over from the newest ones
+                Terminal.clear_messages()
+                Terminal.log("stored history is outdated, loading recent messages")
+
+        # use prefetched page if there is one
+        page = cls._prefetched.pop(channel.id, None)
+        cls._history_pages = cls.fetch_history(channel.id, before=page[-1].id if page else None)
+        if page is None:
+            page = await anext(cls._history_pages, None)
+            if page:
+                # first page ends with the newest message, newer ones are received as events
+                channel.last_message_id = max(channel.last_message_id or 0, page[0].id)
+                cls.subscriptions.observe(channel.id)
+        if page and ClientUser.focus_channel is channel:
+            cls._request_authors(channel, page)
+            Terminal.prepend_messages(page[::-1])
+
+    @classmethod
+    async def load_older_history(cls):
+        """
+        Loads older page of focused channel's history (when scrolled past the top)
+        """
+
+        if cls._history_pages is None or cls._history_loading:
+            return
+        cls._history_loading = True
+        try:
+            pages = cls._history_pages
+            page = await anext(pages, None)
+            if page is None:
+                if cls._history_pages is pages:
+                    cls._history_pages = None
+            elif cls._history_pages is pages:
+                cls._request_authors(ClientUser.focus_channel, page)
+                inserted = Terminal.prepend_messages(page[::-1])
+
+                # scrollback is full => continue from the oldest inserted message next time
+                if inserted < len(page):
+                    before = page[inserted - 1].id if inserted else page[0].id + 1
+                    cls._history_pages = cls.fetch_history(ClientUser.focus_channel.id, before=before)
+        finally:
+            cls._history_loading = False
+
+    @classmethod
+    async def prefetch_history(cls):
+        """
+        Prefetches first history page of channels that are likely to be opened next
+        (channels with unread messages, and recent private channels)
+        """
+
+        def newer(channel: Channel) -> int:
+            return channel.last_message_id or 0
+
+        channels = [*ClientUser.private_channels, *(c for g in ClientUser.known_guilds for c in g.channels)]
+        unread = [
+            channel for channel in channels
+            if channel.last_message_id and channel.id in cls._read_states and
+            newer(channel) > (cls._read_states[channel.id] or 0)]
+        recent = sorted(ClientUser.private_channels, key=newer, reverse=True)
+
+        # pick channels (unread first), without duplicates
+        picked = []
+        for channel in sorted(unread, key=newer, reverse=True) + recent:
+            if len(picked) >= cls.prefetch_channels:
+                break
+            if channel not in picked and channel.last_message_id:
+                picked.append(channel)
+
+        limit = asyncio.Semaphore(cls.prefetch_concurrency)
+
+        async def prefetch(channel: Channel):
+            async with limit:
+                pages = cls.fetch_history(channel.id)
+                page = await anext(pages, None)
+                await pages.aclose()
+                # skip the page if focused, or if a message was received while it was being fetched
+                if page and channel is not ClientUser.focus_channel and page[0].id >= channel.last_message_id:
+                    cls._prefetched[channel.id] = page
+
+        await asyncio.gather(*(prefetch(channel) for channel in picked))
+
     @classmethod
     async def close(cls):
         """
         Closes the connection
         """
 
+        cls._closing = True
+        await cls.http.close()
         await cls._sock.close()
 
     @classmethod
@@ -174,73 +789,266 @@ class Client:
             Terminal.print_message(message)
 
     @classmethod
-    async def _process_event(cls, event):
+    async def _handle_heartbeat_ack(cls, _):
         """
-        Processes the event
+        HEARTBEAT_ACK
         """
 
-        event_type = event["t"]
-        event_data = event["d"]
-
-        # READY event (when authorised)
-        if event_type == "READY":
-            # get current's user info
-            cls.user = ClientUser(
-                id=event_data["user"]["id"],
-                username=event_data["user"]["username"])
-
-            # get known users
-            for user_raw in event_data["users"]:
-                user = User(
-                    id=user_raw["id"],
-                    username=user_raw["username"],
-                    global_name=user_raw["global_name"],
-                    bot=user_raw.get("bot"))
-
-                cls.user.known_users.append(user)
-
-            # get all private channels
-            for channel_raw in event_data["private_channels"]:
-                # get recipients
-                recipients = []
-                for usr in cls.user.known_users:
-                    if usr.id in channel_raw["recipient_ids"]:
-                        recipients.append(usr)
-
-                channel = Channel(
-                    id=channel_raw["id"],
-                    type=channel_raw["type"],
-                    recipients=recipients)
-
-                cls.user.private_channels.append(channel)
-
-            # get some guilds
-            for guild_raw in event_data["guilds"]:
-                guild = Guild(
-                    id=guild_raw["id"],
-                    name=guild_raw["properties"]["name"],
-                    description=guild_raw["properties"]["description"],
-                    roles=[Role(**x) for x in guild_raw["roles"]],
-                    channels=[Channel(**x) for x in guild_raw["channels"]])
-
-                cls.user.known_guilds.append(guild)
-
-            await cls.on_ready()
-
-        # READY_SUPPLEMENTAL event (after READY event)
-        elif event_type == "READY_SUPPLEMENTAL":
-            # data here is not very useful (yet)
-            pass
+        cls._heartbeat_acked = True
+        if cls._heartbeat_sent_at is not None:
+            cls.gateway_latency.add(time.perf_counter() - cls._heartbeat_sent_at)
+            cls._heartbeat_sent_at = None
 
-        # SESSIONS_REPLACE event (after READY_SUPPLEMENTAL event)
-        elif event_type == "SESSIONS_REPLACE":
-            # data here is not very useful (yet)
-            pass
+    @classmethod
+    async def _handle_heartbeat(cls, _):
+        """
+        HEARTBEAT (discord asks to send heartbeat right away)
+        """
 
-        # MESSAGE_CREATE
-        elif event_type == "MESSAGE_CREATE":
-            message = Message.from_create_event(event_data)
-            await cls.on_message_create(message)
+        await cls._send_heartbeat()
+
+    @classmethod
+    async def _handle_reconnect(cls, _):
+        """
+        RECONNECT (discord asks to reconnect and resume)
+        """
+
+        await cls._sock.close(code=4000)
+
+    @classmethod
+    async def _handle_invalid_session(cls, resumable: bool):
+        """
+        INVALID_SESSION (data tells whether the session is resumable)
+        """
+
+        await asyncio.sleep(1 + 4 * random())
+        if resumable and cls._session_id:
+            await cls._send_resume()
+        else:
+            cls._session_id = None
+            cls._sequence = None
+            await cls._send_identify()
+
+    @classmethod
+    async def _handle_ready(cls, event_data: dict):
+        """
+        READY event (when authorised)
+        """
+
+        # store session for resuming
+        cls._session_id = event_data["session_id"]
+        cls._resume_gateway_url = event_data.get("resume_gateway_url")
+        cls._session_ready()
+
+        # get current's user info
+        cls.user = ClientUser(
+            id=event_data["user"]["id"],
+            username=event_data["user"]["username"])
+        ClientUser.me = cls.user
+
+        # get known users
+        async for user_raw in cls._chunked(event_data["users"]):
+            ClientUser.add_user(User(
+                id=user_raw["id"],
+                username=user_raw["username"],
+                global_name=user_raw["global_name"],
+                bot=user_raw.get("bot", False)))
+
+        # pin friends, so they never get evicted from the cache
+        async for relationship in cls._chunked(event_data.get("relationships", [])):
+            friend = ClientUser.get_user(relationship["id"])
+            if relationship["type"] == 1 and friend is not None:
+                ClientUser.add_user(friend, friend=True)
+
+        # get all private channels
+        async for channel_raw in cls._chunked(event_data["private_channels"]):
+            # get recipients
+            recipients = []
+            for uid in channel_raw["recipient_ids"]:
+                usr = ClientUser.get_user(uid)
+                if usr is not None:
+                    recipients.append(usr)
+
+            ClientUser.add_private_channel(Channel(
+                id=channel_raw["id"],
+                type=channel_raw["type"],
+                recipients=recipients,
+                last_message_id=channel_raw.get("last_message_id")))
+
+        # get some guilds (roles and channels are built later)
+        async for guild_raw in cls._chunked(event_data["guilds"]):
+            ClientUser.add_guild(Guild(
+                id=guild_raw["id"],
+                name=guild_raw["properties"]["name"],
+                description=guild_raw["properties"]["description"],
+                raw_roles=guild_raw["roles"],
+                raw_channels=guild_raw["channels"]))
+
+        # read states (used to find channels with unread messages)
+        read_state = event_data.get("read_state", {})
+        for entry in read_state.get("entries", []) if isinstance(read_state, dict) else read_state:
+            last_message_id = entry.get("last_message_id")
+            cls._read_states[int(entry["id"])] = int(last_message_id) if last_message_id else None
+
+        await cls.on_ready()
+        asyncio.create_task(cls._after_ready())
+
+    @classmethod
+    async def _after_ready(cls):
+        """
+        Subscribes to recently focused channels again (new session has no subscriptions),
+        builds the rest of the guilds in background (one guild at a time), then prefetches history
+        """
+
+        await cls.subscriptions.resubscribe()
+        for guild in list(ClientUser.known_guilds):
+            if not guild.materialized:
+                guild.materialize()
+                await asyncio.sleep(0)
+        await cls.prefetch_history()
+
+    @classmethod
+    async def _chunked(cls, items: list):
+        """
+        Yields items, giving control back to the event loop after every chunk
+        """
+
+        for index, item in enumerate(items, 1):
+            yield item
+            if index % cls.hydration_chunk_size == 0:
+                await asyncio.sleep(0)
+
+    @classmethod
+    async def _handle_resumed(cls, _):
+        """
+        RESUMED event (missed events were replayed)
+        """
+
+        if cls._resume_sent_at is not None:
+            cls.resume_latency.add(time.perf_counter() - cls._resume_sent_at)
+            cls._resume_sent_at = None
+        cls._session_ready()
+        Terminal.log("session resumed")
+
+    @classmethod
+    async def _handle_message_create(cls, event_data: dict):
+        """
+        MESSAGE_CREATE event
+        """
+
+        if cls.store is not None:
+            cls.store.add(event_data)
+        message = Message.from_create_event(event_data)
+        channel = message.channel
+        if channel is not None:
+            # previous message was seen, and none could be missed since => stored history stays complete
+            if (cls.store is not None and channel.last_message_id is not None and
+                    (channel.guild is None or cls.subscriptions.is_synced(channel.id))):
+                cls.store.extend_range(channel.id, channel.last_message_id, message.id)
+            channel.last_message_id = message.id
+            cls.subscriptions.observe(channel.id)
+        # prefetched page is outdated now
+        cls._prefetched.pop(int(event_data["channel_id"]), None)
+        await cls.on_message_create(message)
+
+    @classmethod
+    async def _handle_channel_upsert(cls, event_data: dict):
+        """
+        CHANNEL_CREATE and CHANNEL_UPDATE events
+        """
+
+        ClientUser.upsert_channel(Channel.from_response(event_data))
+
+    @classmethod
+    async def _handle_channel_delete(cls, event_data: dict):
+        """
+        CHANNEL_DELETE event
+        """
+
+        channel = ClientUser.remove_channel(event_data["id"])
+        cls.subscriptions.forget(int(event_data["id"]))
+        if channel is not None and channel is ClientUser.focus_channel:
+            ClientUser.focus_channel = None
+            cls._history_pages = None
+            Terminal.log("focused channel was deleted")
+
+    @classmethod
+    async def _handle_guild_members_chunk(cls, event_data: dict):
+        """
+        GUILD_MEMBERS_CHUNK event (response to op 8)
+        """
+
+        guild = ClientUser.get_guild(event_data["guild_id"])
+        if guild is None:
+            return
+        received = {}
+        for member_raw in event_data.get("members", []):
+            member = cls._add_member(guild, member_raw)
+            received[member.user.id] = member
+            cls._members_requested.discard((guild.id, member.user.id))
+
+        # show received members on messages which authors were requested
+        def resolve(message: Message) -> bool:
+            if (isinstance(message.author, User) and message.author.id in received and
+                    message.channel is not None and message.channel.guild is guild):
+                message.author = received[message.author.id]
+                return True
+            return False
+        Terminal.refresh_messages(resolve)
+
+    @classmethod
+    async def _handle_guild_member_update(cls, event_data: dict):
+        """
+        GUILD_MEMBER_ADD and GUILD_MEMBER_UPDATE events
+        """
+
+        guild = ClientUser.get_guild(event_data["guild_id"])
+        if guild is not None:
+            cls._add_member(guild, event_data)
+
+    @classmethod
+    async def _handle_guild_member_remove(cls, event_data: dict):
+        """
+        GUILD_MEMBER_REMOVE event
+        """
+
+        guild = ClientUser.get_guild(event_data["guild_id"])
+        if guild is not None:
+            guild.remove_member(event_data["user"]["id"])
+
+    @staticmethod
+    def _add_member(guild: Guild, member_raw: dict) -> Member:
+        """
+        Adds member (and its user) to the cache
+        """
+
+        user_raw = member_raw["user"]
+        user = ClientUser.add_user(User(
+            id=user_raw["id"],
+            username=user_raw["username"],
+            global_name=user_raw.get("global_name"),
+            bot=user_raw.get("bot", False)))
+        return guild.add_member(Member(
+            user=user,
+            nick=member_raw.get("nick"),
+            roles=guild.resolve_roles(member_raw.get("roles", ()))))
+
+
+# built-in event handlers (registered first, so they run before other handlers of the same priority)
+Client.events.add(11, Client._handle_heartbeat_ack)
+Client.events.add(1, Client._handle_heartbeat)
+Client.events.add(7, Client._handle_reconnect)
+Client.events.add(9, Client._handle_invalid_session)
+Client.events.add("READY", Client._handle_ready)
+Client.events.add("RESUMED", Client._handle_resumed)
+Client.events.add("MESSAGE_CREATE", Client._handle_message_create)
+Client.events.add("CHANNEL_CREATE", Client._handle_channel_upsert)
+Client.events.add("CHANNEL_UPDATE", Client._handle_channel_upsert)
+Client.events.add("CHANNEL_DELETE", Client._handle_channel_delete)
+Client.events.add("GUILD_MEMBERS_CHUNK", Client._handle_guild_members_chunk)
+Client.events.add("GUILD_MEMBER_ADD", Client._handle_guild_member_update)
+Client.events.add("GUILD_MEMBER_UPDATE", Client._handle_guild_member_update)
+Client.events.add("GUILD_MEMBER_REMOVE", Client._handle_guild_member_remove)
 
 
 async def process_user_input(user_input: list[str]):
@@ -283,7 +1091,7 @@ async def process_user_input(user_input: list[str]):
             # check index
             try:
                 index = int(command[1])
-                if index > len(Client.user.known_guilds) or index < 0:
+                if index >= len(Client.user.known_guilds) or index < 0:
                     raise ValueError
             except ValueError:
                 Terminal.log(f"incorrect guild index")
@@ -291,7 +1099,7 @@ async def process_user_input(user_input: list[str]):
 
             Terminal.log(f"list of channels for [{index}]")
             count = 0
-            for channel in Client.user.known_guilds[index].channels:
+            for channel in Client.user.known_guilds[index].channel_tree.ordered:
                 if channel.type != ChannelType.GUILD_CATEGORY:
                     Terminal.log(f"\t[{count}] {channel.name}")
                     count += 1
@@ -316,21 +1124,22 @@ async def process_user_input(user_input: list[str]):
                 # check index
                 try:
                     channel_idx = int(command[1])
-                    if channel_idx > len(Client.user.private_channels) or channel_idx < 0:
+                    if channel_idx >= len(Client.user.private_channels) or channel_idx < 0:
                         raise ValueError
                 except ValueError:
                     Terminal.log(f"incorrect channel index")
                     return
 
-                Client.user.focus_channel = Client.user.private_channels[channel_idx]
-                Terminal.log(f"now chatting with {Client.user.focus_channel.recipients[0].username}")
+                channel = Client.user.private_channels[channel_idx]
+                Client.set_focus(channel)
+                Terminal.log(f"now chatting with {channel.recipients[0].username}")
 
             # guild channels
             else:
                 # check guild index
                 try:
                     guild_idx = int(command[1])
-                    if guild_idx > len(Client.user.known_guilds) or guild_idx < 0:
+                    if guild_idx >= len(Client.user.known_guilds) or guild_idx < 0:
                         raise ValueError
                 except ValueError:
                     Terminal.log(f"incorrect guild index")
@@ -338,20 +1147,148 @@ async def process_user_input(user_input: list[str]):
                 # check channel index
                 try:
                     channel_idx = int(command[2])
-                    count = 0
-                    for channel in Client.user.known_guilds[guild_idx].channels:
-                        if channel_idx == count and channel.type != ChannelType.GUILD_CATEGORY:
-                            break
-                        if channel.type != ChannelType.GUILD_CATEGORY:
-                            count += 1
-                    else:
+                    selectable = Client.user.known_guilds[guild_idx].channel_tree.selectable
+                    if channel_idx >= len(selectable) or channel_idx < 0:
                         raise ValueError
+                    channel = selectable[channel_idx]
                 except ValueError:
                     Terminal.log(f"incorrect channel index")
                     return
 
-                Client.user.focus_channel = channel
-                Terminal.log(f"now focused on {Client.user.focus_channel.name}")
+                Client.set_focus(channel)
+                Terminal.log(f"now focused on {channel.name}")
+
+        # search cmd
+        elif command[0] == "s" or command[0] == "search":
+            if Client.store is None:
+                Terminal.log("message store is disabled")
+                return
+
+            # split words and filters
+            words, filters, page = [], {}, 1
+            try:
+                for arg in command[1:]:
+                    key, _, value = arg.partition(":")
+                    if not value or key not in ("in", "guild", "from", "before", "after", "page"):
+                        words.append(arg)
+                    elif key == "in":
+                        if value == "here" and Client.user.focus_channel is None:
+                            raise ValueError("no channel is focused")
+                        filters["channel_id"] = Client.user.focus_channel.id if value == "here" else int(value)
+                    elif key == "guild":
+                        # guild:#index (as in //lg) or guild:id
+                        if value.startswith("#"):
+                            index = int(value[1:])
+                            if index >= len(Client.user.known_guilds) or index < 0:
+                                raise ValueError(f"no guild with index {index}")
+                            filters["guild_id"] = Client.user.known_guilds[index].id
+                        else:
+                            filters["guild_id"] = int(value)
+                    elif key == "from":
+                        if value.isdigit():
+                            filters["author_id"] = int(value)
+                        else:
+                            users = [*ClientUser.friends.values(), *ClientUser.known_users.values()]
+                            author = next((user for user in users if user.username == value), None)
+                            if author is None:
+                                raise ValueError(f"unknown user {value}")
+                            filters["author_id"] = author.id
+                    elif key in ("before", "after"):
+                        filters[key] = datetime.fromisoformat(value).astimezone()
+                    else:
+                        page = max(1, int(value))
+            except ValueError as exc:
+                Terminal.log(f"incorrect search filter ({exc})")
+                return
+
+            results = await Client.store.search(
+                " ".join(words), **filters,
+                limit=Client.search_page_size + 1, offset=(page - 1) * Client.search_page_size)
+            if not results:
+                Terminal.log("no messages found")
+                return
+
+            Terminal.log(f"search results, page {page}")
+            for raw in results[:Client.search_page_size]:
+                channel = ClientUser.get_channel(raw["channel_id"])
+                if channel is None:
+                    place = raw["channel_id"]
+                elif channel.name:
+                    place = f"#{channel.name}"
+                else:
+                    place = ", ".join(user.username for user in channel.recipients)
+                content = raw.get("content", "").replace("\n", " ")
+                Terminal.log(
+                    f"\t{CLIENT_COL[3]}{snowflake.to_datetime(raw['id']):%Y-%m-%d %H:%M} "
+                    f"{place} {raw['author']['username']}{CLIENT_COL[2]}: {content[:120]}")
+            if len(results) > Client.search_page_size:
+                Terminal.log(f"more results on {STYLE_BOLD}page:{page + 1}{CS_RESET}")
+
+        # gateway latency cmd
+        elif command[0] == "ping":
+            latency = Client.gateway_latency
+            if not latency:
+                Terminal.log("no heartbeats were acknowledged yet")
+                return
+            Terminal.log(
+                f"gateway latency: {latency.last * 1000:.0f}ms "
+                f"(p50 {latency.percentile(50) * 1000:.0f}ms, "
+                f"p99 {latency.percentile(99) * 1000:.0f}ms, "
+                f"{len(latency)} samples)")
+
+        # client statistics cmd
+        elif command[0] == "stats":
+            Terminal.log("client statistics")
+            Terminal.log(
+                f"\tcache: {len(ClientUser.known_users) + len(ClientUser.friends)} users, "
+                f"{len(ClientUser.known_guilds)} guilds "
+                f"({sum(guild.materialized for guild in ClientUser.known_guilds)} built), "
+                f"{sum(len(guild.members) for guild in ClientUser.known_guilds)} members, "
+                f"{ClientUser.cache_hits} hits, {ClientUser.cache_misses} misses")
+            Terminal.log(
+                f"\tterminal: {Terminal.bytes_written} bytes written, "
+                f"{Terminal.frames_rendered} frames rendered")
+            Terminal.log(
+                f"\tgateway: {Client.bytes_received} bytes received"
+                + (f", {Client.bytes_decompressed} bytes decompressed" if Client._compress else ""))
+            Terminal.log(
+                f"\tgateway rate: {Client.event_rate.rate():.1f} events/s, "
+                f"{Client.byte_rate.rate() / 1024:.1f} KiB/s (last {Client.event_rate.window:.0f}s), "
+                f"{len(Client.subscriptions.channels)} channels subscribed, "
+                f"{Client.subscriptions.updates_sent} subscription updates sent")
+            Terminal.log(
+                f"\trest: {Client.http.connections_opened} connections opened, "
+                f"{Client.http.connections_reused} reused, "
+                f"{Client.rest.queue_depth} queued, {Client.rest.rate_limited} rate limited")
+            if Client.rest.wait_time:
+                Terminal.log(
+                    f"\trest wait: p50 {Client.rest.wait_time.percentile(50) * 1000:.0f}ms, "
+                    f"p99 {Client.rest.wait_time.percentile(99) * 1000:.0f}ms")
+            Terminal.log(
+                f"\tevents: {sum(Client.events_decoded.values())} decoded, "
+                f"{sum(Client.events_skipped.values())} skipped ({Client.bytes_skipped} bytes not decoded)")
+            for event_type, count in sorted(Client.events_skipped.items(), key=lambda x: -x[1]):
+                Terminal.log(f"\t\tskipped {event_type}: {count}")
+            Terminal.log(
+                f"\tevent queue: {Client._event_queue.qsize()} queued (max {Client.max_queue_depth}), "
+                f"{Client.events_dropped} dropped, {Client.events_coalesced} coalesced"
+                + (f", lag p50 {Client.queue_lag.percentile(50) * 1000:.1f}ms, "
+                   f"p99 {Client.queue_lag.percentile(99) * 1000:.1f}ms" if Client.queue_lag else ""))
+            slowest = sorted(Client.events.handler_time.items(), key=lambda x: -x[1].percentile(99))
+            for name, timing in slowest[:5]:
+                errors = Client.events.handler_errors.get(name, 0)
+                Terminal.log(
+                    f"\t\thandler {name}: {timing.count} runs, p99 {timing.percentile(99) * 1000:.2f}ms"
+                    + (f", {errors} errors" if errors else ""))
+            if Client.store is not None:
+                Terminal.log(
+                    f"\tstore: {Client.store.messages_written} messages written "
+                    f"in {Client.store.batches_written} batches")
+            if Client.reconnects:
+                Terminal.log(
+                    f"\treconnects: {Client.reconnects}, "
+                    f"last took {Client.reconnect_latency.last:.2f}s"
+                    + (f", last resume took {Client.resume_latency.last:.2f}s" if Client.resume_latency.last else ""))
 
         # exit cmd
         elif command[0] == "e" or command[0] == "exit":
@@ -360,9 +1297,11 @@ async def process_user_input(user_input: list[str]):
     # just a message
     else:
         if Client.user.focus_channel:
-            await Client.send_post_request(
-                url=f"{API}/channels/{Client.user.focus_channel.id}/messages",
+            response = await Client.api_request(
+                "POST", f"/channels/{Client.user.focus_channel.id}/messages",
                 json={"content": string})
+            if not response.ok:
+                Terminal.log(f"message was not sent ({response.status} {response.reason})")
         else:
             Terminal.log(
                 f"please pick a channel first. Use {CLIENT_COL[3]}//help{CLIENT_COL[2]} to see all commands")
@@ -1,10 +1,18 @@
 # terminal
 TERM_CURSOR = "\33[42m"
 TERM_INPUT_FIELD = "\33[48;5;236m"
+TERM_SYNC_BEGIN = "\33[?2026h"
+TERM_SYNC_END = "\33[?2026l"
 
 # API links
-GATEWAY = r"wss://gateway.discord.gg/?v=9&encoding=json"
+GATEWAY = r"wss://gateway.discord.gg"
+GATEWAY_VERSION = 9
+ZLIB_SUFFIX = b"\x00\x00\xff\xff"
+GATEWAY_FATAL_CLOSE_CODES = (4004, 4010, 4011, 4012, 4013, 4014)     # don't reconnect
+GATEWAY_SESSION_CLOSE_CODES = (4007, 4009)                          # reconnect, but don't resume
 API = r"https://discord.com/api/v9"
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) " \
+             "Chrome/123.0.0.0 Safari/537.36"
 
 # pings
 PING_HIGHLIGHT = "\33[36m"
@@ -18,6 +26,7 @@ STYLE_BOLD = "\33[1m"
 STYLE_ITALICS = "\33[3m"
 STYLE_UNDERLINE = "\33[4m"
 STYLE_STRIKETHROUGH = "\33[9m"
+STYLE_SPOILER = "\33[48;5;240m"
 
 # client
 CLIENT_COL = [
@@ -46,6 +55,21 @@ CLIENT_HELP = [
         "args": ["guild/channel", "channel"],
         "text": "pick channel to focus on. Private channel is arg 1"
     },
+    {
+        "cmd": ["s", "search"],
+        "args": ["words", "in:channel", "guild:guild", "from:user", "before:date", "after:date", "page:page"],
+        "text": "searches stored messages. Filters are optional, guild is an id or #index, dates are YYYY-MM-DD"
+    },
+    {
+        "cmd": ["ping"],
+        "args": [],
+        "text": "shows gateway latency"
+    },
+    {
+        "cmd": ["stats"],
+        "args": [],
+        "text": "shows client statistics"
+    },
     {
         "cmd": ["e", "exit"],
         "args": [],
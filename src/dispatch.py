@@ -0,0 +1,94 @@
+import time
+from typing import Any, Callable, Awaitable
+from .metrics import RollingWindow
+
+
+Handler = Callable[[Any], Awaitable[None]]
+
+
+class Dispatcher:
+    """
+    Dispatches gateway events to registered handlers.
+    Handlers are registered for an op code (int), or for a dispatch event type (str, f.e. "MESSAGE_CREATE")
+    """
+
+    def __init__(self, **kwargs):
+        """
+        :key error_callback: called with the handler and the exception when a handler fails
+        """
+
+        self.error_callback: Callable[[Handler, Exception], None] | None = kwargs.get("error_callback")
+
+        self._handlers: dict[int | str, list[tuple[int, Handler]]] = {}
+        self.event_types: set[str] = set()          # dispatch event types that have handlers
+
+        # statistics
+        self.handler_time: dict[str, RollingWindow] = {}     # handler name -> run time (seconds)
+        self.handler_errors: dict[str, int] = {}             # handler name -> amount of raised exceptions
+
+    def add(self, key: int | str, handler: Handler, priority: int = 0):
+        """
+        Registers the handler
+        :param key: op code, or dispatch event type
+        :param handler: async function, called with event data
+        :param priority: handlers with higher priority run first (same priority => registration order)
+        """
+
+        handlers = self._handlers.setdefault(key, [])
+        handlers.append((priority, handler))
+        handlers.sort(key=lambda x: -x[0])
+        if isinstance(key, str):
+            self.event_types.add(key)
+
+    def remove(self, key: int | str, handler: Handler):
+        """
+        Unregisters the handler
+        """
+
+        handlers = [x for x in self._handlers.get(key, []) if x[1] != handler]
+        if handlers:
+            self._handlers[key] = handlers
+        else:
+            self._handlers.pop(key, None)
+            self.event_types.discard(key)
+
+    def on(self, *keys: int | str, priority: int = 0):
+        """
+        Decorator which registers the handler for given op codes / event types
+        """
+
+        def decorator(handler: Handler) -> Handler:
+            for key in keys:
+                self.add(key, handler, priority)
+            return handler
+        return decorator
+
+    async def dispatch(self, event: dict):
+        """
+        Runs handlers of the event's op code, then handlers of its event type.
+        Exception in one handler doesn't stop the others
+        """
+
+        for key in (event["op"], event["t"]):
+            for _, handler in self._handlers.get(key, ()):
+                started = time.perf_counter()
+                try:
+                    await handler(event["d"])
+                except Exception as exc:
+                    name = _name(handler)
+                    self.handler_errors[name] = self.handler_errors.get(name, 0) + 1
+                    if self.error_callback is not None:
+                        self.error_callback(handler, exc)
+                finally:
+                    self._timing(handler).add(time.perf_counter() - started)
+
+    def _timing(self, handler: Handler) -> RollingWindow:
+        name = _name(handler)
+        window = self.handler_time.get(name)
+        if window is None:
+            window = self.handler_time[name] = RollingWindow(1000)
+        return window
+
+
+def _name(handler: Handler) -> str:
+    return getattr(handler, "__qualname__", repr(handler))
@@ -0,0 +1,203 @@
+import zlib
+from struct import Struct
+from typing import Any
+
+
+# term tags
+FORMAT_VERSION = 131
+NEW_FLOAT_EXT = 70
+COMPRESSED = 80
+SMALL_INTEGER_EXT = 97
+INTEGER_EXT = 98
+FLOAT_EXT = 99
+ATOM_EXT = 100
+SMALL_TUPLE_EXT = 104
+LARGE_TUPLE_EXT = 105
+NIL_EXT = 106
+STRING_EXT = 107
+LIST_EXT = 108
+BINARY_EXT = 109
+SMALL_BIG_EXT = 110
+LARGE_BIG_EXT = 111
+SMALL_ATOM_EXT = 115
+MAP_EXT = 116
+ATOM_UTF8_EXT = 118
+SMALL_ATOM_UTF8_EXT = 119
+
+# atoms that have python counterparts
+_ATOMS = {
+    "nil": None,
+    "null": None,
+    "true": True,
+    "false": False,
+}
+
+_UINT16 = Struct(">H")
+_UINT32 = Struct(">I")
+_INT32 = Struct(">i")
+_FLOAT64 = Struct(">d")
+
+
+class _Decoder:
+    """
+    ETF decoder state
+    """
+
+    def __init__(self, data: bytes):
+        self.data: bytes = data
+        self.pos: int = 0
+
+    def term(self) -> Any:
+        """
+        Decodes next term
+        """
+
+        tag = self.data[self.pos]
+        self.pos += 1
+        try:
+            return _DECODERS[tag](self)
+        except KeyError:
+            raise ValueError(f"unsupported ETF term tag {tag}") from None
+
+    def read(self, size: int) -> bytes:
+        """
+        Reads `size` raw bytes
+        """
+
+        chunk = self.data[self.pos:self.pos + size]
+        self.pos += size
+        return chunk
+
+    def u8(self) -> int:
+        self.pos += 1
+        return self.data[self.pos - 1]
+
+    def u16(self) -> int:
+        self.pos += 2
+        return _UINT16.unpack_from(self.data, self.pos - 2)[0]
+
+    def u32(self) -> int:
+        self.pos += 4
+        return _UINT32.unpack_from(self.data, self.pos - 4)[0]
+
+    def atom(self, size: int) -> Any:
+        name = self.read(size).decode("utf-8")
+        return _ATOMS.get(name, name)
+
+    def big(self, size: int) -> int:
+        sign = self.u8()
+        value = int.from_bytes(self.read(size), "little")
+        return -value if sign else value
+
+    def items(self, size: int) -> list:
+        return [self.term() for _ in range(size)]
+
+
+def _decode_list(dec: _Decoder) -> list:
+    items = dec.items(dec.u32())
+    tail = dec.term()
+    if tail != []:
+        items.append(tail)
+    return items
+
+
+def _decode_map(dec: _Decoder) -> dict:
+    result = {}
+    for _ in range(dec.u32()):
+        key = dec.term()
+        result[key] = dec.term()
+    return result
+
+
+_DECODERS = {
+    NEW_FLOAT_EXT: lambda dec: _FLOAT64.unpack(dec.read(8))[0],
+    SMALL_INTEGER_EXT: lambda dec: dec.u8(),
+    INTEGER_EXT: lambda dec: _INT32.unpack(dec.read(4))[0],
+    FLOAT_EXT: lambda dec: float(dec.read(31).split(b"\x00", 1)[0]),
+    ATOM_EXT: lambda dec: dec.atom(dec.u16()),
+    SMALL_TUPLE_EXT: lambda dec: tuple(dec.items(dec.u8())),
+    LARGE_TUPLE_EXT: lambda dec: tuple(dec.items(dec.u32())),
+    NIL_EXT: lambda dec: [],
+    STRING_EXT: lambda dec: dec.read(dec.u16()).decode("latin-1"),
+    LIST_EXT: _decode_list,
+    BINARY_EXT: lambda dec: dec.read(dec.u32()).decode("utf-8"),
+    SMALL_BIG_EXT: lambda dec: dec.big(dec.u8()),
+    LARGE_BIG_EXT: lambda dec: dec.big(dec.u32()),
+    SMALL_ATOM_EXT: lambda dec: dec.atom(dec.u8()),
+    MAP_EXT: _decode_map,
+    ATOM_UTF8_EXT: lambda dec: dec.atom(dec.u16()),
+    SMALL_ATOM_UTF8_EXT: lambda dec: dec.atom(dec.u8()),
+}
+
+
+def decode(data: bytes) -> Any:
+    """
+    Decodes ETF encoded data. Snowflakes are decoded as ints
+    :param data: encoded data (starts with format version)
+    """
+
+    if data[0] != FORMAT_VERSION:
+        raise ValueError(f"unsupported ETF format version {data[0]}")
+
+    # compressed term
+    if data[1] == COMPRESSED:
+        data = bytes([FORMAT_VERSION]) + zlib.decompress(data[6:])
+
+    decoder = _Decoder(data)
+    decoder.pos = 1
+    return decoder.term()
+
+
+def _encode_term(value: Any, out: list[bytes]):
+    """
+    Appends encoded term to the output list
+    """
+
+    if value is None:
+        out.append(b"\x77\x03nil")
+    elif value is True:
+        out.append(b"\x77\x04true")
+    elif value is False:
+        out.append(b"\x77\x05false")
+    elif isinstance(value, int):
+        if 0 <= value <= 255:
+            out.append(bytes((SMALL_INTEGER_EXT, value)))
+        elif -2 ** 31 <= value < 2 ** 31:
+            out.append(bytes((INTEGER_EXT,)) + _INT32.pack(value))
+        else:
+            magnitude = abs(value)
+            raw = magnitude.to_bytes((magnitude.bit_length() + 7) // 8, "little")
+            if len(raw) > 255:
+                out.append(bytes((LARGE_BIG_EXT,)) + _UINT32.pack(len(raw)) + bytes((value < 0,)) + raw)
+            else:
+                out.append(bytes((SMALL_BIG_EXT, len(raw), value < 0)) + raw)
+    elif isinstance(value, float):
+        out.append(bytes((NEW_FLOAT_EXT,)) + _FLOAT64.pack(value))
+    elif isinstance(value, (str, bytes)):
+        raw = value.encode("utf-8") if isinstance(value, str) else value
+        out.append(bytes((BINARY_EXT,)) + _UINT32.pack(len(raw)) + raw)
+    elif isinstance(value, (list, tuple)):
+        if not value:
+            out.append(bytes((NIL_EXT,)))
+            return
+        out.append(bytes((LIST_EXT,)) + _UINT32.pack(len(value)))
+        for item in value:
+            _encode_term(item, out)
+        out.append(bytes((NIL_EXT,)))
+    elif isinstance(value, dict):
+        out.append(bytes((MAP_EXT,)) + _UINT32.pack(len(value)))
+        for key, item in value.items():
+            _encode_term(key, out)
+            _encode_term(item, out)
+    else:
+        raise TypeError(f"can't encode {type(value).__name__} to ETF")
+
+
+def encode(value: Any) -> bytes:
+    """
+    Encodes value to ETF
+    """
+
+    out = [bytes((FORMAT_VERSION,))]
+    _encode_term(value, out)
+    return b"".join(out)
@@ -1,69 +1,342 @@
 import re
+from bisect import bisect_right
+from functools import lru_cache
+from collections import OrderedDict
 from .constants import *
-from .types import Message, User, Member
+from .types import Message, User, Member, ClientUser
 
 
+# display width table. Sorted, non-overlapping (first, last, width) code point ranges.
+# Code points outside of these ranges are 1 cell wide
+_WIDTH_TABLE = (
+    (0x0300, 0x036F, 0), (0x0483, 0x0489, 0), (0x0591, 0x05BD, 0), (0x0610, 0x061A, 0),
+    (0x064B, 0x065F, 0), (0x1100, 0x115F, 2), (0x200B, 0x200F, 0), (0x20D0, 0x20FF, 0),
+    (0x231A, 0x231B, 2), (0x2329, 0x232A, 2), (0x23E9, 0x23EC, 2), (0x23F0, 0x23F0, 2),
+    (0x23F3, 0x23F3, 2), (0x25FD, 0x25FE, 2), (0x2614, 0x2615, 2), (0x2648, 0x2653, 2),
+    (0x267F, 0x267F, 2), (0x2693, 0x2693, 2), (0x26A1, 0x26A1, 2), (0x26AA, 0x26AB, 2),
+    (0x26BD, 0x26BE, 2), (0x26C4, 0x26C5, 2), (0x26CE, 0x26CE, 2), (0x26D4, 0x26D4, 2),
+    (0x26EA, 0x26EA, 2), (0x26F2, 0x26F3, 2), (0x26F5, 0x26F5, 2), (0x26FA, 0x26FA, 2),
+    (0x26FD, 0x26FD, 2), (0x2705, 0x2705, 2), (0x270A, 0x270B, 2), (0x2728, 0x2728, 2),
+    (0x274C, 0x274C, 2), (0x274E, 0x274E, 2), (0x2753, 0x2755, 2), (0x2757, 0x2757, 2),
+    (0x2795, 0x2797, 2), (0x27B0, 0x27B0, 2), (0x27BF, 0x27BF, 2), (0x2B1B, 0x2B1C, 2),
+    (0x2B50, 0x2B50, 2), (0x2B55, 0x2B55, 2), (0x2E80, 0x303E, 2), (0x3041, 0x33FF, 2),
+    (0x3400, 0x4DBF, 2), (0x4E00, 0x9FFF, 2), (0xA000, 0xA4CF, 2), (0xA960, 0xA97F, 2),
+    (0xAC00, 0xD7A3, 2), (0xF900, 0xFAFF, 2), (0xFE00, 0xFE0F, 0), (0xFE10, 0xFE19, 2),
+    (0xFE20, 0xFE2F, 0), (0xFE30, 0xFE6F, 2), (0xFF00, 0xFF60, 2), (0xFFE0, 0xFFE6, 2),
+    (0x16FE0, 0x16FF1, 2), (0x17000, 0x18D08, 2), (0x1AFF0, 0x1B2FF, 2), (0x1F004, 0x1F004, 2),
+    (0x1F0CF, 0x1F0CF, 2), (0x1F18E, 0x1F18E, 2), (0x1F191, 0x1F19A, 2), (0x1F200, 0x1F202, 2),
+    (0x1F210, 0x1F23B, 2), (0x1F240, 0x1F248, 2), (0x1F250, 0x1F251, 2), (0x1F260, 0x1F265, 2),
+    (0x1F300, 0x1F3FA, 2), (0x1F3FB, 0x1F3FF, 0), (0x1F400, 0x1F64F, 2), (0x1F680, 0x1F6FF, 2),
+    (0x1F7E0, 0x1F7F0, 2), (0x1F90C, 0x1F9FF, 2), (0x1FA70, 0x1FAFF, 2), (0x20000, 0x2FFFD, 2),
+    (0x30000, 0x3FFFD, 2), (0xE0000, 0xE0FFF, 0),
+)
+_WIDTH_STARTS = [x[0] for x in _WIDTH_TABLE]
+
+# widths of already measured characters
+_char_widths: dict[str, int] = {}
+
+# escape sequences (CSI), captured so that `split` keeps them
+_ESCAPE_RE = re.compile("(\33\\[[0-?]*[ -/]*[@-~])")
+
+
+def char_width(char: str) -> int:
+    """
+    Returns amount of terminal cells the character takes
+    """
+
+    if char == "\t":
+        return 4
+    code = ord(char)
+    if code < 0x0300:
+        return 1
+    idx = bisect_right(_WIDTH_STARTS, code) - 1
+    if idx >= 0 and code <= _WIDTH_TABLE[idx][1]:
+        return _WIDTH_TABLE[idx][2]
+    return 1
+
+
+def _wrap_line(line: str, width: int, active: list[str]) -> list[str]:
+    """
+    Wraps a single line (without newlines) into rows no wider than `width` cells.
+    Every row can be printed on its own: it starts with the styles (SGR sequences) active at its start,
+    which are reset at its end. `active` is updated with the styles active at the end of the line
+    """
+
+    rows = []
+    row = list(active)
+    col = 0
+    for idx, token in enumerate(_ESCAPE_RE.split(line)):
+        # escape sequences take no space
+        if idx % 2:
+            row.append(token)
+            if token == CS_RESET or token == "\33[m":
+                active.clear()
+            elif token[-1] == "m":
+                active.append(token)
+
+        # ascii text is 1 cell per character, so it can be sliced right away
+        elif token.isascii() and "\t" not in token:
+            start = 0
+            while start < len(token):
+                if col >= width:
+                    if active:
+                        row.append(CS_RESET)
+                    rows.append("".join(row))
+                    row = list(active)
+                    col = 0
+                chunk = token[start:start + width - col]
+                row.append(chunk)
+                col += len(chunk)
+                start += len(chunk)
+
+        # anything else is measured character by character
+        else:
+            start = 0
+            for pos, char in enumerate(token):
+                char_len = _char_widths.get(char)
+                if char_len is None:
+                    char_len = _char_widths[char] = char_width(char)
+                if col + char_len > width and col > 0:
+                    row.append(token[start:pos])
+                    if active:
+                        row.append(CS_RESET)
+                    rows.append("".join(row))
+                    row = list(active)
+                    col = 0
+                    start = pos
+                col += char_len
+            row.append(token[start:])
+    if active:
+        row.append(CS_RESET)
+    rows.append("".join(row))
+    return rows
+
+
+@lru_cache(maxsize=4096)
 def character_wrap(string: str, width=120) -> str:
     """
-    Character wraps a string. ignores escape sequences
+    Character wraps a string. ignores escape sequences, counts wide characters (CJK, emoji) as 2 cells.
+    Styles are re-applied at the start of every row, so rows can be redrawn one by one
+    """
+
+    rows = []
+    active = []
+    for line in string.split("\n"):
+        rows += _wrap_line(line, width, active)
+    return "\n".join(rows)
+
+
+# markdown tokens. Searched once per message, left to right
+_MARKDOWN_RE = re.compile(
+    r"```|`|\*\*\*|\*\*|\*|___|__|_|~~|\|\||<@!?\d+>|<@&\d+>|<#\d+>|@everyone|@here|\\[^\w\s]|^> ",
+    re.MULTILINE)
+
+# styles of paired markers
+_MARKER_STYLES = {
+    "**": STYLE_BOLD,
+    "*": STYLE_ITALICS,
+    "_": STYLE_ITALICS,
+    "__": STYLE_UNDERLINE,
+    "~~": STYLE_STRIKETHROUGH,
+    "||": STYLE_SPOILER,
+}
+
+# styles of other span kinds
+_KIND_STYLES = {
+    "code": CODE_BLOCK,
+    "codeblock": CODE_BLOCK,
+    "quote": STYLE_DARKEN,
+    "user": PING_HIGHLIGHT,
+    "role": PING_HIGHLIGHT,
+    "channel": PING_HIGHLIGHT,
+    "everyone": PING_HIGHLIGHT,
+}
+
+# formatted messages, by (message id, edit timestamp)
+_format_cache: OrderedDict[tuple, str] = OrderedDict()
+FORMAT_CACHE_SIZE = 2048
+
+
+def _mention_kind(token: str) -> str | None:
+    """
+    Returns span kind of the token if it's a mention or a quote
+    """
+
+    if token.startswith("<@&"):
+        return "role"
+    if token.startswith("<@"):
+        return "user"
+    if token.startswith("<#"):
+        return "channel"
+    if token[0] == "@":
+        return "everyone"
+    if token == "> ":
+        return "quote"
+    return None
+
+
+def tokenize_markdown(content: str) -> list[tuple[str, tuple[str, ...]]]:
+    """
+    Tokenizes discord markdown in a single pass.
+    Returns list of spans (text, kinds), where kinds are active markers ("**", "~~", ...)
+    followed by span kind ("code", "user", ...) if it has one
     """
 
-    is_esc = False
-    line_len = 0
-    new_string = ""
-    for idx, char in enumerate(string):
-        new_string += char
-        line_len += 1 if not is_esc else 0
+    tokens: list[list] = []     # [text, kind], kind is None for literal text, "open" / "close" for markers
+    stack: list[int] = []       # indices of unclosed markers
+
+    def marker(token: str):
+        open_markers = [tokens[idx][0] for idx in stack]
+        if token not in open_markers:
+            stack.append(len(tokens))
+            tokens.append([token, "open"])
+            return
+
+        # close the marker. Everything that was opened after it is not closed => literal text
+        while True:
+            idx = stack.pop()
+            if tokens[idx][0] == token:
+                break
+            tokens[idx][1] = None
+        tokens.append([token, "close"])
+
+    pos = 0
+    while (match := _MARKDOWN_RE.search(content, pos)) is not None:
+        token = match.group()
+        if match.start() > pos:
+            tokens.append([content[pos:match.start()], None])
+        pos = match.end()
+
+        # code (nothing inside of it is formatted)
+        if token[0] == "`":
+            end = content.find(token, pos)
+            if end == -1:
+                tokens.append([token, None])
+                continue
+            code = content[pos:end]
+            if token == "```":
+                language, newline, rest = code.partition("\n")
+                code = (rest if newline and language.isalnum() else code).strip("\n")
+            tokens.append([code, "code" if token == "`" else "codeblock"])
+            pos = end + len(token)
 
-        # newline
-        if char == "\n":
-            line_len = 0
+        # escaped character
+        elif token[0] == "\\":
+            tokens.append([token[1], None])
 
-        # escape character
-        elif char == "\33":
-            is_esc = True
+        # mentions and quotes
+        elif kind := _mention_kind(token):
+            tokens.append([token, kind])
 
-        # when we found end of escape sequence
-        elif char in "mHKJ" and is_esc:
-            is_esc = False
-            line_len -= 1
+        # underscores inside of words (snake_case) are not markers
+        elif (token[0] == "_" and 0 < match.start() and pos < len(content) and
+              content[match.start() - 1].isalnum() and content[pos].isalnum()):
+            tokens.append([token, None])
 
-        elif line_len >= width and idx < len(string) and string[idx+1] != "\n":
-            new_string += "\n"
-            line_len = 0
-    return new_string
+        # bold italics / underline italics
+        elif len(token) == 3:
+            outer, inner = token[:2], token[2]
+            if inner in [tokens[idx][0] for idx in stack]:
+                marker(inner)
+                marker(outer)
+            else:
+                marker(outer)
+                marker(inner)
 
+        else:
+            marker(token)
+    if pos < len(content):
+        tokens.append([content[pos:], None])
 
-def apply_style(content: str, brackets: str, style: str):
+    # unclosed markers are literal text
+    for idx in stack:
+        tokens[idx][1] = None
+
+    # make spans
+    spans: list[tuple[str, tuple[str, ...]]] = []
+    active: list[str] = []
+    for text, kind in tokens:
+        if kind == "open":
+            active.append(text)
+        elif kind == "close":
+            active.remove(text)
+        else:
+            kinds = tuple(active) if kind is None else (*active, kind)
+            if kind is None and spans and spans[-1][1] == kinds:
+                spans[-1] = (spans[-1][0] + text, kinds)
+            else:
+                spans.append((text, kinds))
+    return spans
+
+
+def render_spans(spans: list[tuple[str, tuple[str, ...]]], message: Message | None = None) -> str:
     """
-    Applies style to the content string
+    Renders spans made by `tokenize_markdown` to terminal escape sequences
     """
 
-    brs = "\\" + "\\".join(list(brackets))
-    regex = brs + r"(.*?)" + brs
-    for string in re.findall(regex, content):
-        content = content.replace(f"{brackets}{string}{brackets}", f"{style}{string}{CS_RESET}")
-    return content
+    guild = message.channel.guild if message and message.channel else None
+    me = ClientUser.me.id if ClientUser.me else None
+
+    output = []
+    for text, kinds in spans:
+        kind = kinds[-1] if kinds and kinds[-1] not in _MARKER_STYLES else None
+        style = "".join(_MARKER_STYLES.get(x) or _KIND_STYLES[x] for x in kinds)
+
+        # resolve mentions
+        if kind == "user":
+            uid = int(text.strip("<@!>"))
+            user = ClientUser.get_user(uid)
+            text = f"@{user.username if user else uid}"
+            if uid == me:
+                style += PING_ME_HIGHLIGHT
+        elif kind == "role":
+            rid = int(text.strip("<@&>"))
+            role = guild.get_role(rid) if guild else None
+            text = f"@{role.name if role else rid}"
+        elif kind == "channel":
+            channel = ClientUser.get_channel(text.strip("<#>"))
+            text = f"#{channel.name if channel and channel.name else text.strip('<#>')}"
+        elif kind == "everyone":
+            style += PING_ME_HIGHLIGHT
+        elif kind == "quote":
+            text = "| "
+
+        output.append(f"{CS_RESET}{style}{text}{CS_RESET}" if style else text)
+    return "".join(output)
 
 
 def format_message(message: Message) -> str:
     """
-    Returns terminal formatted message
+    Returns terminal formatted message. Memoized by message id and edit time
     """
 
+    key = (message.id, message.edited_timestamp)
+    if key in _format_cache:
+        _format_cache.move_to_end(key)
+        return _format_cache[key]
+
     timestamp = message.timestamp.strftime("%H:%M:%S")
     if isinstance(message.author, User):
         nickname = message.author.username
     else:
-        nickname = message.author.nick
+        nickname = message.author.nick or message.author.user.username
+        color = message.author.color
+        if color:
+            nickname = f"\33[38;2;{color >> 16};{color >> 8 & 255};{color & 255}m{nickname}{CS_RESET}"
+
+    content = render_spans(tokenize_markdown(message.content), message)
+
+    formatted = character_wrap(
+        f"{STYLE_DARKEN}[{timestamp}]{CS_RESET} {nickname}{STYLE_DARKEN}>{CS_RESET} {content}")
+    _format_cache[key] = formatted
+    if len(_format_cache) > FORMAT_CACHE_SIZE:
+        _format_cache.popitem(last=False)
+    return formatted
 
-    content = message.content
 
-    # apply styles
-    content = apply_style(content, "**", STYLE_BOLD)
-    content = apply_style(content, "*", STYLE_ITALICS)
-    content = apply_style(content, "__", STYLE_UNDERLINE)
-    content = apply_style(content, "~~", STYLE_STRIKETHROUGH)
-    content = apply_style(content, "`", CODE_BLOCK)
+def forget_message(message: Message):
+    """
+    Drops memoized formatting of the message (f.e. when its author was resolved to a member)
+    """
 
-    return character_wrap(f"{STYLE_DARKEN}[{timestamp}]{CS_RESET} {nickname}{STYLE_DARKEN}>{CS_RESET} {content}")
+    _format_cache.pop((message.id, message.edited_timestamp), None)
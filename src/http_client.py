@@ -0,0 +1,334 @@
+import ssl
+import json
+import time
+import asyncio
+from typing import Any, AsyncIterable
+from urllib.parse import urlsplit, urlencode
+
+
+class HTTPError(Exception):
+    """
+    Raised when HTTP response can't be read
+    """
+
+
+class HTTPResponse:
+    """
+    HTTP response
+    """
+
+    def __init__(self, **kwargs):
+        """
+        :key status: status code
+        :key reason: status reason
+        :key headers: response headers (lowercase names)
+        :key body: response body (None if response is streamed)
+        """
+
+        self.status: int = kwargs.get("status")
+        self.reason: str = kwargs.get("reason", "")
+        self.headers: dict[str, str] = kwargs.get("headers", dict())
+        self.body: bytes | None = kwargs.get("body")
+        self._chunks: AsyncIterable[bytes] | None = kwargs.get("chunks")
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+    def text(self) -> str:
+        """
+        Returns body as text
+        """
+
+        return self.body.decode("utf-8")
+
+    def json(self) -> Any:
+        """
+        Returns body decoded from JSON
+        """
+
+        return json.loads(self.body) if self.body else None
+
+    async def iter_chunks(self):
+        """
+        Iterates over body chunks (for streamed responses)
+        """
+
+        if self._chunks is None:
+            if self.body:
+                yield self.body
+            return
+        async for chunk in self._chunks:
+            yield chunk
+        self._chunks = None
+
+
+class _Connection:
+    """
+    Pooled keep-alive connection
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader: asyncio.StreamReader = reader
+        self.writer: asyncio.StreamWriter = writer
+        self.last_used: float = time.monotonic()
+
+    def usable(self, idle_timeout: float) -> bool:
+        """
+        Checks if connection can be reused
+        """
+
+        return (not self.reader.at_eof() and not self.writer.is_closing() and
+                time.monotonic() - self.last_used < idle_timeout)
+
+    def close(self):
+        self.writer.close()
+
+
+class HTTPClient:
+    """
+    Asyncio HTTP/1.1 client with a keep-alive connection pool
+    """
+
+    def __init__(self, **kwargs):
+        """
+        :key timeout: default request timeout in seconds
+        :key max_connections: max amount of connections per host
+        :key idle_timeout: idle connections are closed after that many seconds
+        :key user_agent: User-Agent header
+        """
+
+        self.timeout: float = kwargs.get("timeout", 30)
+        self.max_connections: int = kwargs.get("max_connections", 10)
+        self.idle_timeout: float = kwargs.get("idle_timeout", 60)
+        self.user_agent: str = kwargs.get("user_agent", "headless-discord")
+
+        self._pools: dict[tuple, list[_Connection]] = {}
+        self._limits: dict[tuple, asyncio.Semaphore] = {}
+        self._ssl: ssl.SSLContext = ssl.create_default_context()
+
+        # statistics
+        self.connections_opened: int = 0
+        self.connections_reused: int = 0
+
+    async def request(
+            self, method: str, url: str, *,
+            headers: dict[str, str] | None = None,
+            params: dict[str, Any] | None = None,
+            json: Any = None,
+            data: bytes | AsyncIterable[bytes] | None = None,
+            timeout: float | None = None,
+            stream: bool = False) -> HTTPResponse:
+        """
+        Sends HTTP request
+        :param method: HTTP method (GET, POST, PATCH, DELETE, ...)
+        :param url: full url
+        :param headers: additional headers
+        :param params: query parameters
+        :param json: JSON body
+        :param data: raw body, or async iterable of body chunks (sent using chunked encoding)
+        :param timeout: timeout in seconds (until the response headers are read)
+        :param stream: don't read the body. Use `HTTPResponse.iter_chunks` to read it
+        """
+
+        parts = urlsplit(url)
+        secure = parts.scheme == "https"
+        key = (parts.hostname, parts.port or (443 if secure else 80), secure)
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+        if params:
+            target += ("&" if parts.query else "?") + urlencode(params)
+
+        # build request head
+        head = {
+            "Host": parts.netloc,
+            "User-Agent": self.user_agent,
+            "Accept": "*/*",
+            "Connection": "keep-alive"}
+        if json is not None:
+            data = _json_dumps(json).encode("utf-8")
+            head["Content-Type"] = "application/json"
+        if _is_stream(data):
+            head["Transfer-Encoding"] = "chunked"
+        elif data is not None:
+            head["Content-Length"] = str(len(data))
+        elif method in ("POST", "PUT", "PATCH"):
+            head["Content-Length"] = "0"
+        head.update(headers or {})
+        request_head = (
+            f"{method} {target} HTTP/1.1\r\n" +
+            "".join(f"{name}: {value}\r\n" for name, value in head.items()) +
+            "\r\n").encode("latin-1")
+
+        return await asyncio.wait_for(
+            self._send(key, method, request_head, data, stream),
+            timeout if timeout is not None else self.timeout)
+
+    async def _send(self, key: tuple, method: str, request_head: bytes, data, stream: bool) -> HTTPResponse:
+        """
+        Sends request over pooled connection. Retries once on fresh connection, if reused one was dead
+        """
+
+        limit = self._limits.setdefault(key, asyncio.Semaphore(self.max_connections))
+        await limit.acquire()
+        conn = None
+        streaming = False
+        try:
+            for attempt in range(2):
+                conn, reused = await self._acquire(key, fresh=attempt > 0)
+                try:
+                    conn.writer.write(request_head)
+                    if isinstance(data, (bytes, bytearray)):
+                        conn.writer.write(data)
+                    elif data is not None:
+                        async for chunk in data:
+                            if chunk:
+                                conn.writer.write(f"{len(chunk):X}\r\n".encode("ascii") + chunk + b"\r\n")
+                                await conn.writer.drain()
+                        conn.writer.write(b"0\r\n\r\n")
+                    await conn.writer.drain()
+                    status_line = await conn.reader.readline()
+                    if not status_line:
+                        raise ConnectionResetError("connection closed by server")
+                    break
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    conn.close()
+                    # only retry on reused connections (server could have closed them while idle)
+                    if not (reused and attempt == 0 and not _is_stream(data)):
+                        raise
+
+            # read the response head
+            try:
+                _, status, *reason = status_line.decode("latin-1").rstrip("\r\n").split(" ", 2)
+                status = int(status)
+            except ValueError:
+                raise HTTPError(f"bad status line: {status_line!r}") from None
+            headers = {}
+            while (line := await conn.reader.readline()) not in (b"\r\n", b"\n", b""):
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            # connection can be reused if the body length is known
+            reusable = headers.get("connection", "").lower() != "close" and (
+                "content-length" in headers or "chunked" in headers.get("transfer-encoding", "") or
+                method == "HEAD" or status in (204, 304) or status < 200)
+            chunks = self._read_body(conn, method, status, headers)
+
+            # streamed response releases the connection once the body was read
+            if stream:
+                streaming = True
+                return HTTPResponse(
+                    status=status, reason="".join(reason), headers=headers,
+                    chunks=self._stream(key, conn, chunks, reusable, limit))
+
+            body = b"".join([chunk async for chunk in chunks])
+            self._release(key, conn, reusable)
+            return HTTPResponse(status=status, reason="".join(reason), headers=headers, body=body)
+        except BaseException:
+            if conn is not None:
+                conn.close()
+            raise
+        finally:
+            if not streaming:
+                limit.release()
+
+    async def _stream(self, key: tuple, conn: _Connection, chunks, reusable: bool, limit: asyncio.Semaphore):
+        """
+        Yields streamed body chunks, then returns connection to the pool
+        """
+
+        try:
+            async for chunk in chunks:
+                yield chunk
+            self._release(key, conn, reusable)
+        except BaseException:
+            conn.close()
+            raise
+        finally:
+            limit.release()
+
+    @staticmethod
+    async def _read_body(conn: _Connection, method: str, status: int, headers: dict[str, str]):
+        """
+        Yields response body chunks
+        """
+
+        reader = conn.reader
+        if method == "HEAD" or status in (204, 304) or status < 200:
+            return
+
+        # chunked
+        if "chunked" in headers.get("transfer-encoding", ""):
+            while True:
+                size = int((await reader.readline()).split(b";", 1)[0].strip(), 16)
+                if size == 0:
+                    # skip trailers
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    return
+                yield await reader.readexactly(size)
+                await reader.readexactly(2)
+
+        # known length
+        elif "content-length" in headers:
+            remaining = int(headers["content-length"])
+            while remaining > 0:
+                chunk = await reader.read(min(remaining, 65536))
+                if not chunk:
+                    raise asyncio.IncompleteReadError(b"", remaining)
+                remaining -= len(chunk)
+                yield chunk
+
+        # until connection is closed
+        else:
+            while chunk := await reader.read(65536):
+                yield chunk
+
+    async def _acquire(self, key: tuple, fresh: bool = False) -> tuple[_Connection, bool]:
+        """
+        Returns pooled connection, or opens new one. Second value tells if the connection was reused
+        """
+
+        pool = self._pools.setdefault(key, [])
+        while pool and not fresh:
+            conn = pool.pop()
+            if conn.usable(self.idle_timeout):
+                self.connections_reused += 1
+                return conn, True
+            conn.close()
+
+        host, port, secure = key
+        reader, writer = await asyncio.open_connection(
+            host, port, ssl=self._ssl if secure else None, server_hostname=host if secure else None)
+        self.connections_opened += 1
+        return _Connection(reader, writer), False
+
+    def _release(self, key: tuple, conn: _Connection, reusable: bool):
+        """
+        Returns connection to the pool
+        """
+
+        if not reusable:
+            conn.close()
+            return
+        conn.last_used = time.monotonic()
+        self._pools.setdefault(key, []).append(conn)
+
+    async def close(self):
+        """
+        Closes all pooled connections
+        """
+
+        for pool in self._pools.values():
+            for conn in pool:
+                conn.close()
+        self._pools.clear()
+
+
+def _json_dumps(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"))
+
+
+def _is_stream(data) -> bool:
+    return data is not None and not isinstance(data, (bytes, bytearray))
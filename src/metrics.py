@@ -0,0 +1,94 @@
+from math import ceil
+from time import monotonic
+from collections import deque
+
+
+class RollingWindow:
+    """
+    Keeps last N samples of a metric (latency, wait time, ...)
+    """
+
+    def __init__(self, size: int = 100):
+        """
+        :param size: amount of samples to keep
+        """
+
+        self.samples: deque[float] = deque(maxlen=size)
+        self.count: int = 0
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    def add(self, value: float):
+        """
+        Adds new sample
+        """
+
+        self.samples.append(value)
+        self.count += 1
+
+    @property
+    def last(self) -> float | None:
+        """
+        Newest sample. None if there are no samples
+        """
+
+        return self.samples[-1] if self.samples else None
+
+    def mean(self) -> float | None:
+        """
+        Mean of kept samples. None if there are no samples
+        """
+
+        return sum(self.samples) / len(self.samples) if self.samples else None
+
+    def percentile(self, pct: float) -> float | None:
+        """
+        Returns percentile (0-100) of kept samples, using nearest rank. None if there are no samples
+        """
+
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        rank = max(0, min(len(ordered) - 1, ceil(pct / 100 * len(ordered)) - 1))
+        return ordered[rank]
+
+
+class RateCounter:
+    """
+    Counts amount of something (events, bytes, ...) per second, over last N seconds
+    """
+
+    def __init__(self, window: float = 10):
+        """
+        :param window: length of the window in seconds
+        """
+
+        self.window: float = window
+        self.samples: deque[tuple[float, float]] = deque()   # (time, amount)
+        self.total: float = 0                                # sum of amounts within the window
+        self.started: float = monotonic()
+
+    def add(self, amount: float = 1):
+        """
+        Counts new amount
+        """
+
+        now = monotonic()
+        self.samples.append((now, amount))
+        self.total += amount
+        self._expire(now)
+
+    def rate(self) -> float:
+        """
+        Amount per second within the window
+        """
+
+        now = monotonic()
+        self._expire(now)
+        elapsed = min(self.window, now - self.started)
+        return self.total / elapsed if elapsed > 0 else 0.0
+
+    def _expire(self, now: float):
+        while self.samples and now - self.samples[0][0] > self.window:
+            self.total -= self.samples.popleft()[1]
@@ -0,0 +1,183 @@
+import re
+import time
+import asyncio
+from collections import deque
+from .http_client import HTTPClient, HTTPResponse
+from .metrics import RollingWindow
+
+
+# ids that are part of rate limit bucket (major parameters)
+_MAJOR_RE = re.compile(r"^/(channels|guilds|webhooks)/(\d+)")
+_ID_RE = re.compile(r"/\d+")
+
+
+class Bucket:
+    """
+    Rate limit bucket
+    """
+
+    def __init__(self):
+        self.lock: asyncio.Lock = asyncio.Lock()   # requests in the bucket are sent one by one, in order
+        self.limit: int | None = None
+        self.remaining: int | None = None          # None if unknown
+        self.reset_at: float = 0                   # time.monotonic() when the bucket resets
+        self.queued: int = 0                       # amount of requests waiting for (or holding) the bucket
+
+
+class RestScheduler:
+    """
+    Schedules REST requests, respecting per-route and global rate limits.
+    Buckets are learned from X-RateLimit-* response headers
+    """
+
+    def __init__(self, http: HTTPClient, **kwargs):
+        """
+        :param http: HTTP client used to send requests
+        :key global_limit: max amount of requests per second (over all buckets)
+        :key max_retries: max amount of retries after 429 response
+        """
+
+        self.http: HTTPClient = http
+        self.global_limit: int = kwargs.get("global_limit", 50)
+        self.max_retries: int = kwargs.get("max_retries", 5)
+
+        self._route_buckets: dict[str, str] = {}   # route -> bucket hash (from X-RateLimit-Bucket)
+        self._buckets: dict[str, Bucket] = {}      # bucket hash + major parameter -> bucket
+        self._global_reset_at: float = 0           # set when global rate limit was hit
+        self._sent: deque[float] = deque()         # send times of requests within the last second
+
+        # statistics
+        self.wait_time: RollingWindow = RollingWindow(1000)   # time spent waiting for rate limits (seconds)
+        self.rate_limited: int = 0                            # amount of 429 responses
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Amount of requests waiting for their bucket
+        """
+
+        # learned buckets are stored under both route and bucket hash => count each one once
+        buckets = {id(bucket): bucket for bucket in self._buckets.values()}
+        return sum(max(0, bucket.queued - 1) for bucket in buckets.values())
+
+    @staticmethod
+    def route(method: str, endpoint: str) -> tuple[str, str]:
+        """
+        Returns route (method and endpoint without minor ids) and major parameter of the endpoint
+        """
+
+        path = endpoint.split("?", 1)[0]
+        major = _MAJOR_RE.search(path)
+        major_id = major.group(2) if major else ""
+
+        # replace every id except for the major one
+        route = _ID_RE.sub(lambda x: x.group() if major and x.start() == major.start(2) - 1 else "/{id}", path)
+        return f"{method} {route}", major_id
+
+    def _bucket(self, route: str, major: str) -> Bucket:
+        """
+        Returns bucket for the route
+        """
+
+        key = f"{self._route_buckets.get(route, route)}:{major}"
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = Bucket()
+        return bucket
+
+    async def request(self, method: str, url: str, endpoint: str, **kwargs) -> HTTPResponse:
+        """
+        Sends the request as soon as rate limits allow it
+        :param method: HTTP method
+        :param url: full url
+        :param endpoint: API endpoint (used to find the bucket)
+        :param kwargs: arguments for `HTTPClient.request`
+        """
+
+        route, major = self.route(method, endpoint)
+        bucket = self._bucket(route, major)
+        bucket.queued += 1
+        try:
+            async with bucket.lock:
+                for _ in range(self.max_retries + 1):
+                    await self._wait(bucket)
+                    response = await self.http.request(method, url, **kwargs)
+                    self._update(route, major, bucket, response)
+                    if response.status != 429:
+                        return response
+                return response
+        finally:
+            bucket.queued -= 1
+
+    async def _wait(self, bucket: Bucket):
+        """
+        Waits until the request can be sent
+        """
+
+        started = time.monotonic()
+        while True:
+            now = time.monotonic()
+            delay = 0
+
+            # global rate limit hit
+            if self._global_reset_at > now:
+                delay = self._global_reset_at - now
+
+            # bucket is exhausted
+            elif bucket.remaining == 0 and bucket.reset_at > now:
+                delay = bucket.reset_at - now
+
+            # too many requests within the last second
+            else:
+                while self._sent and now - self._sent[0] >= 1:
+                    self._sent.popleft()
+                if len(self._sent) >= self.global_limit:
+                    delay = 1 - (now - self._sent[0])
+
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+
+        # bucket has reset
+        if bucket.reset_at <= time.monotonic():
+            bucket.remaining = None
+        elif bucket.remaining:
+            bucket.remaining -= 1
+
+        self._sent.append(time.monotonic())
+        self.wait_time.add(time.monotonic() - started)
+
+    def _update(self, route: str, major: str, bucket: Bucket, response: HTTPResponse):
+        """
+        Updates bucket using response headers
+        """
+
+        now = time.monotonic()
+        headers = response.headers
+
+        # learn the bucket of the route
+        bucket_hash = headers.get("x-ratelimit-bucket")
+        if bucket_hash and self._route_buckets.get(route) != bucket_hash:
+            self._route_buckets[route] = bucket_hash
+            self._buckets.setdefault(f"{bucket_hash}:{major}", bucket)
+
+        if "x-ratelimit-limit" in headers:
+            bucket.limit = int(headers["x-ratelimit-limit"])
+        if "x-ratelimit-remaining" in headers:
+            bucket.remaining = int(headers["x-ratelimit-remaining"])
+        if "x-ratelimit-reset-after" in headers:
+            bucket.reset_at = now + float(headers["x-ratelimit-reset-after"])
+
+        # rate limited
+        if response.status == 429:
+            self.rate_limited += 1
+            try:
+                body = response.json() or {}
+            except ValueError:
+                body = {}
+            retry_after = float(body.get("retry_after") or headers.get("retry-after") or 1)
+            if body.get("global") or headers.get("x-ratelimit-scope") == "global":
+                self._global_reset_at = now + retry_after
+            else:
+                bucket.remaining = 0
+                bucket.reset_at = max(bucket.reset_at, now + retry_after)
@@ -0,0 +1,38 @@
+from datetime import datetime, timezone
+
+
+# first second of 2015, in milliseconds since unix epoch
+DISCORD_EPOCH = 1420070400000
+
+
+def unix_ms(snowflake: int | str) -> int:
+    """
+    Returns creation time of the snowflake, in milliseconds since unix epoch
+    """
+
+    return (int(snowflake) >> 22) + DISCORD_EPOCH
+
+
+def to_datetime(snowflake: int | str) -> datetime:
+    """
+    Returns creation time of the snowflake (UTC)
+    """
+
+    return datetime.fromtimestamp(unix_ms(snowflake) / 1000, timezone.utc)
+
+
+def from_unix_ms(ms: int) -> int:
+    """
+    Returns the smallest snowflake created at the given time (milliseconds since unix epoch).
+    Usable as `before`/`after` cursor
+    """
+
+    return max(0, ms - DISCORD_EPOCH) << 22
+
+
+def from_datetime(moment: datetime) -> int:
+    """
+    Returns the smallest snowflake created at the given moment. Usable as `before`/`after` cursor
+    """
+
+    return from_unix_ms(int(moment.timestamp() * 1000))
@@ -0,0 +1,311 @@
+import os
+import json
+import queue
+import sqlite3
+import asyncio
+import threading
+from . import snowflake
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    channel_id INTEGER NOT NULL,
+    guild_id INTEGER,
+    author_id INTEGER,
+    content TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_channel ON messages (channel_id, id);
+CREATE TABLE IF NOT EXISTS history_ranges (
+    channel_id INTEGER NOT NULL,
+    first_id INTEGER NOT NULL,
+    last_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_ranges_channel ON history_ranges (channel_id);
+"""
+
+# full-text index, kept in sync with the messages table by triggers
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(content, content='messages', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_au AFTER UPDATE ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+END;
+"""
+
+
+class MessageStore:
+    """
+    On-disk message store (SQLite in WAL mode).
+    Messages are stored as raw discord message objects, and written in batches by a background thread.
+    Stored history of a channel can have gaps (f.e. messages received while the channel wasn't opened),
+    so the store also keeps id ranges which are known to be complete, and only loads history from them
+    """
+
+    def __init__(self, path: str, **kwargs):
+        """
+        :param path: database file path
+        :key batch_size: max amount of messages written in one transaction
+        :key flush_interval: max amount of seconds a message waits before being written
+        """
+
+        self.path: str = path
+        self.batch_size: int = kwargs.get("batch_size", 200)
+        self.flush_interval: float = kwargs.get("flush_interval", 0.5)
+
+        # create database
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.executescript(_SCHEMA)
+        self.full_text: bool = self._create_full_text(conn)
+
+        # complete history ranges: channel id -> [(first id, last id), ...] (sorted, not overlapping)
+        self._ranges: dict[int, list[tuple[int, int]]] = {}
+        for channel_id, first_id, last_id in conn.execute(
+                "SELECT channel_id, first_id, last_id FROM history_ranges ORDER BY first_id"):
+            self._ranges.setdefault(channel_id, []).append((first_id, last_id))
+        conn.close()
+
+        # reader connection (used from executor threads, one at a time)
+        self._reader: sqlite3.Connection = self._connect(check_same_thread=False)
+        self._reader_lock: threading.Lock = threading.Lock()
+
+        # background writer
+        self._queue: queue.Queue = queue.Queue()
+        self._writer: threading.Thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+        # statistics
+        self.messages_written: int = 0
+        self.batches_written: int = 0
+
+    def _connect(self, **kwargs) -> sqlite3.Connection:
+        """
+        Opens new connection to the database
+        """
+
+        conn = sqlite3.connect(self.path, **kwargs)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @staticmethod
+    def _create_full_text(conn: sqlite3.Connection) -> bool:
+        """
+        Creates the full-text index and its triggers, if missing.
+        Returns False if SQLite was built without FTS5 (search falls back to LIKE)
+        """
+
+        try:
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'").fetchone()
+            conn.executescript(_FTS_SCHEMA)
+            if not exists:
+                with conn:
+                    conn.execute("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')")
+        except sqlite3.OperationalError:
+            return False
+        return True
+
+    def add(self, raw: dict, guild_id: str | None = None):
+        """
+        Queues raw message object for writing. Doesn't block
+        """
+
+        self._queue.put(("message", (
+            int(raw["id"]),
+            int(raw["channel_id"]),
+            int(guild_id or raw.get("guild_id") or 0) or None,
+            int(raw["author"]["id"]) if raw.get("author") else None,
+            raw.get("content") or "",
+            json.dumps(raw, separators=(",", ":")))))
+
+    def add_range(self, channel_id: int, first_id: int, last_id: int):
+        """
+        Marks history of the channel from first_id to last_id (both included) as complete.
+        Range is queued after the messages, so it's only used once they are written.
+        first_id 0 means the range starts at the beginning of the channel
+        """
+
+        self._queue.put(("range", (int(channel_id), int(first_id), int(last_id))))
+
+    def extend_range(self, channel_id: int, previous_id: int, message_id: int):
+        """
+        Extends complete range that contains previous_id up to message_id
+        (for live messages, when no message could be missed in between)
+        """
+
+        self._queue.put(("extend", (int(channel_id), int(previous_id), int(message_id))))
+
+    def _write_loop(self):
+        """
+        Writes queued messages in batches (runs in background thread)
+        """
+
+        conn = self._connect()
+        running = True
+        while running:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+
+            # collect more messages for the same transaction
+            try:
+                while len(batch) < self.batch_size:
+                    item = self._queue.get(timeout=self.flush_interval)
+                    if item is None:
+                        running = False
+                        break
+                    batch.append(item)
+            except queue.Empty:
+                pass
+
+            messages = [item for kind, item in batch if kind == "message"]
+            ranges = {}
+            with conn:
+                # upsert (instead of REPLACE), so the full-text index is updated by the update trigger
+                conn.executemany(
+                    "INSERT INTO messages (id, channel_id, guild_id, author_id, content, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (id) DO UPDATE SET "
+                    "content = excluded.content, data = excluded.data", messages)
+
+                for kind, item in batch:
+                    if kind == "message":
+                        continue
+                    channel_id, first_id, last_id = item
+                    current = ranges.get(channel_id, self._ranges.get(channel_id, []))
+                    if kind == "extend" and not any(first <= first_id <= last for first, last in current):
+                        continue
+                    ranges[channel_id] = _merge(current, first_id, last_id)
+                for channel_id, merged in ranges.items():
+                    conn.execute("DELETE FROM history_ranges WHERE channel_id = ?", (channel_id,))
+                    conn.executemany(
+                        "INSERT INTO history_ranges (channel_id, first_id, last_id) VALUES (?, ?, ?)",
+                        [(channel_id, first, last) for first, last in merged])
+
+            # ranges are used only after their messages were committed
+            self._ranges.update(ranges)
+            self.messages_written += len(messages)
+            self.batches_written += 1
+        conn.close()
+
+    def _query(self, sql: str, params: tuple) -> list[tuple]:
+        with self._reader_lock:
+            return self._reader.execute(sql, params).fetchall()
+
+    def complete_range(self, channel_id: int, message_id: int | None = None) -> tuple[int, int] | None:
+        """
+        Returns complete history range of the channel that contains the message
+        (the newest range if message_id is None), or None if there is no such range
+        """
+
+        ranges = self._ranges.get(int(channel_id))
+        if not ranges:
+            return None
+        if message_id is None:
+            return ranges[-1]
+        return next((x for x in ranges if x[0] <= int(message_id) <= x[1]), None)
+
+    async def load(self, channel_id: int, limit: int = 50, before: int | None = None) -> list[dict]:
+        """
+        Loads raw messages of the channel, newest first.
+        Only messages from one complete range are loaded (so there are no gaps between them):
+        the newest range, or the one containing `before`
+        :param channel_id: channel id
+        :param limit: max amount of messages
+        :param before: load messages before this message id
+        """
+
+        complete = self.complete_range(channel_id, before)
+        if complete is None:
+            return []
+        first_id, last_id = complete
+        sql = "SELECT data FROM messages WHERE channel_id = ? AND id >= ? AND id < ? ORDER BY id DESC LIMIT ?"
+        params = (int(channel_id), first_id, last_id + 1 if before is None else int(before), limit)
+        rows = await asyncio.to_thread(self._query, sql, params)
+        return [json.loads(row[0]) for row in rows]
+
+    async def search(self, text: str, **kwargs) -> list[dict]:
+        """
+        Searches stored messages, newest first
+        :param text: searched words (all of them have to be in the message)
+        :key channel_id: only messages from this channel
+        :key guild_id: only messages from this guild
+        :key author_id: only messages from this user
+        :key before: only messages sent before this datetime
+        :key after: only messages sent after this datetime
+        :key limit: max amount of results
+        :key offset: amount of skipped results (for pagination)
+        """
+
+        sql = "SELECT m.data FROM messages m"
+        where, params = [], []
+        order, column_prefix = "m.id", "m."
+        words = text.split()
+        if words and self.full_text:
+            # full-text index drives the query (walks matches newest first), filters are only checked.
+            # Every word is a quoted string, so FTS5 query syntax can't be injected
+            sql = "SELECT m.data FROM messages_fts f JOIN messages m ON m.id = f.rowid"
+            order, column_prefix = "f.rowid", "+m."
+            where.append("messages_fts MATCH ?")
+            params.append(" ".join('"' + word.replace('"', '""') + '"' for word in words))
+        else:
+            for word in words:
+                where.append("m.content LIKE ? ESCAPE '\\'")
+                params.append("%" + word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+
+        for column in ("channel_id", "guild_id", "author_id"):
+            if kwargs.get(column) is not None:
+                where.append(f"{column_prefix}{column} = ?")
+                params.append(int(kwargs[column]))
+
+        # message ids start with their timestamp
+        if kwargs.get("before") is not None:
+            where.append(f"{order} < ?")
+            params.append(snowflake.from_datetime(kwargs["before"]))
+        if kwargs.get("after") is not None:
+            where.append(f"{order} >= ?")
+            params.append(snowflake.from_datetime(kwargs["after"]))
+
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {order} DESC LIMIT ? OFFSET ?"
+        params += [kwargs.get("limit", 20), kwargs.get("offset", 0)]
+
+        rows = await asyncio.to_thread(self._query, sql, tuple(params))
+        return [json.loads(row[0]) for row in rows]
+
+    def close(self):
+        """
+        Writes all queued messages and closes the store
+        """
+
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        with self._reader_lock:
+            self._reader.close()
+
+
+def _merge(ranges: list[tuple[int, int]], first_id: int, last_id: int) -> list[tuple[int, int]]:
+    """
+    Adds the range to sorted ranges, merging it with the ones it overlaps
+    """
+
+    merged = []
+    for first, last in ranges:
+        if first <= last_id and first_id <= last:
+            first_id, last_id = min(first, first_id), max(last, last_id)
+        else:
+            merged.append((first, last))
+    merged.append((first_id, last_id))
+    merged.sort()
+    return merged
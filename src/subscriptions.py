@@ -0,0 +1,109 @@
+from typing import Any, Callable, Awaitable
+from collections import OrderedDict
+from .types import Channel, Guild
+
+
+class SubscriptionManager:
+    """
+    Keeps lazy guild subscriptions (op 14) for the focused channel, and a few recently focused ones.
+    Channels that fall out of the recent set are unsubscribed
+    """
+
+    def __init__(self, send: Callable[[Any], Awaitable[None]], **kwargs):
+        """
+        :param send: function that sends gateway payload
+        :key max_channels: max amount of subscribed channels (focused one included)
+        :key member_range: member list range requested for every subscribed channel
+        """
+
+        self.send: Callable[[Any], Awaitable[None]] = send
+        self.max_channels: int = kwargs.get("max_channels", 5)
+        self.member_range: tuple[int, int] = kwargs.get("member_range", (0, 99))
+
+        self._recent: OrderedDict[int, Channel] = OrderedDict()    # subscribed channels, least recent first
+        self._synced: set[int] = set()      # subscribed channels which last message id was seen while subscribed
+
+        # statistics
+        self.updates_sent: int = 0
+
+    @property
+    def channels(self) -> list[Channel]:
+        """
+        Subscribed channels, most recent first
+        """
+
+        return list(reversed(self._recent.values()))
+
+    def observe(self, channel_id: int):
+        """
+        Marks last message id of the channel as current, if the channel is subscribed
+        (f.e. after its message was received). Messages of unsubscribed channels aren't received,
+        so their last message id gets outdated
+        """
+
+        if channel_id in self._recent:
+            self._synced.add(channel_id)
+
+    def is_synced(self, channel_id: int) -> bool:
+        """
+        Returns True if the channel stayed subscribed since its last message id was seen
+        """
+
+        return channel_id in self._synced
+
+    async def focus(self, channel: Channel):
+        """
+        Subscribes to the channel, unsubscribing the least recently focused one if there are too many
+        """
+
+        if channel.guild is None:
+            return
+
+        self._recent[channel.id] = channel
+        self._recent.move_to_end(channel.id)
+        removed = []
+        while len(self._recent) > self.max_channels:
+            removed.append(self._recent.popitem(last=False)[1])
+            self._synced.discard(removed[-1].id)
+
+        # update guilds that were changed
+        guilds = {channel.guild.id: channel.guild}
+        guilds.update((x.guild.id, x.guild) for x in removed)
+        for guild in guilds.values():
+            await self._update(guild, [x for x in removed if x.guild is guild])
+
+    async def resubscribe(self):
+        """
+        Sends all subscriptions again (new session starts without any)
+        """
+
+        self._synced.clear()
+        guilds = {channel.guild.id: channel.guild for channel in self._recent.values()}
+        for guild in guilds.values():
+            await self._update(guild, [])
+
+    def forget(self, channel_id: int):
+        """
+        Drops the channel without sending anything (f.e. when it was deleted)
+        """
+
+        self._recent.pop(channel_id, None)
+        self._synced.discard(channel_id)
+
+    async def _update(self, guild: Guild, removed: list[Channel]):
+        """
+        Sends subscription update for the guild
+        """
+
+        channels = {str(x.id): [list(self.member_range)] for x in self._recent.values() if x.guild is guild}
+        channels.update((str(x.id), []) for x in removed)
+        subscribed = any(ranges for ranges in channels.values())
+        await self.send({
+            "op": 14,
+            "d": {
+                "guild_id": str(guild.id),
+                "typing": subscribed,
+                "activities": subscribed,
+                "threads": False,
+                "channels": channels}})
+        self.updates_sent += 1
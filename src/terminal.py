@@ -1,4 +1,6 @@
 import os
+import asyncio
+from collections import deque
 from string import printable
 from sshkeyboard import listen_keyboard_manual
 
@@ -6,6 +8,73 @@ from .types import Message
 from .formatting import *
 
 
+class LineIndex:
+    """
+    Prefix sum index (Fenwick tree) of message line counts.
+    Maps line number to the message containing it in O(log n)
+    """
+
+    def __init__(self, counts=()):
+        self.tree: list[int] = [0]
+        self.total: int = 0
+        for count in counts:
+            self.append(count)
+
+    def __len__(self) -> int:
+        return len(self.tree) - 1
+
+    def append(self, count: int):
+        """
+        Appends new slot to the index
+        """
+
+        idx = len(self.tree)
+        value = count
+        child = idx - 1
+        stop = idx - (idx & -idx)
+        while child > stop:
+            value += self.tree[child]
+            child -= child & -child
+        self.tree.append(value)
+        self.total += count
+
+    def add(self, slot: int, delta: int):
+        """
+        Adds delta to the slot
+        """
+
+        self.total += delta
+        idx = slot + 1
+        while idx < len(self.tree):
+            self.tree[idx] += delta
+            idx += idx & -idx
+
+    def prefix(self, slot: int) -> int:
+        """
+        Returns sum of all slots before the given one
+        """
+
+        total = 0
+        while slot > 0:
+            total += self.tree[slot]
+            slot -= slot & -slot
+        return total
+
+    def find(self, line: int) -> tuple[int, int]:
+        """
+        Returns slot containing the line, and line offset inside that slot
+        """
+
+        slot = 0
+        step = 1 << (len(self).bit_length() - 1) if len(self) else 0
+        while step:
+            if slot + step <= len(self) and self.tree[slot + step] <= line:
+                slot += step
+                line -= self.tree[slot]
+            step >>= 1
+        return slot, line
+
+
 class TerminalMessage:
     """
     Message that the terminal prints
@@ -14,6 +83,8 @@ class TerminalMessage:
     def __init__(self, **kwargs):
         self.content: str | None = kwargs.get("content")
         self.reference_message: Message | None = kwargs.get("reference_message")
+        self.line_count: int = 0
+        self.size: int = 0
 
     def __str__(self) -> str:
         return character_wrap(self.content, Terminal.term_width)
@@ -42,13 +113,34 @@ class Terminal:
     message_field: int = term_height - 2
 
     # terminal stuff
-    messages: list[TerminalMessage] = []       # terminal rendered messages
+    messages: deque[TerminalMessage] = deque() # terminal rendered messages
     print_buffer: str = ""                     # terminal buffer
-    lines: list[str] = []                      # terminal lines
     line_offset: int = 0                       # offset to rendered lines
 
+    # scrollback
+    max_lines: int | None = 10000              # max amount of lines in scrollback (None for no limit)
+    max_bytes: int | None = None               # max amount of bytes in scrollback (None for no limit)
+    spill_path: str | None = None              # file to which lines are appended when evicted
+    _line_index: LineIndex = LineIndex()       # line counts of messages (first slot is `_first_slot`)
+    _first_slot: int = 0                       # index slot of the oldest message
+    _message_bytes: int = 0                    # amount of bytes in scrollback
+    _viewport: dict[int, list[str]] = {}       # wrapped lines of messages on screen (by slot)
+
+    # terminal renderer
+    _screen: list[str] = [""] * message_field  # shadow copy of the message field
+    _screen_offset: int = 0                    # line offset of the shadow copy
+    bytes_written: int = 0                     # total amount of bytes written to the terminal
+
+    # render scheduler
+    frame_rate: int = 30                       # max amount of frames per second
+    frames_rendered: int = 0                   # total amount of rendered frames
+    _dirty_lines: bool = False                 # message field needs to be redrawn
+    _dirty_input: bool = False                 # input field needs to be redrawn
+    _render_event: asyncio.Event | None = None
+
     # terminal user input
     input_callback = None
+    scroll_top_callback = None                 # called when scrolling up past the oldest line
     user_input: list[str] = [" " for _ in range(term_width)]
     user_cursor: int = 0
 
@@ -86,10 +178,10 @@ class Terminal:
             cls.change_line(5)
         elif key == "left":
             cls._move_user_cursor(-1)
-            cls._update_user_input()
+            cls._request_render(user_input=True)
         elif key == "right":
             cls._move_user_cursor(1)
-            cls._update_user_input()
+            cls._request_render(user_input=True)
         elif key == "pageup":
             cls.change_line(-cls.message_field)
         elif key == "pagedown":
@@ -122,19 +214,69 @@ class Terminal:
         """
 
         print(cls.print_buffer, flush=True, end="")
+        cls.bytes_written += len(cls.print_buffer.encode("utf-8"))
         cls.print_buffer = ""
 
     @classmethod
-    def _update_user_input(cls):
+    def _draw_user_input(cls):
         """
-        Updates user input
+        Draws user input
         """
 
         cls._print(f"\33[{cls.message_field + 2};0H", False)
         to_print = TERM_INPUT_FIELD + "".join(cls.user_input[:cls.user_cursor])
         to_print += TERM_CURSOR + cls.user_input[cls.user_cursor] + TERM_INPUT_FIELD
         to_print += "".join(cls.user_input[cls.user_cursor + 1:]) + CS_RESET
-        cls._print("".join(to_print), True)
+        cls._print("".join(to_print))
+
+    @classmethod
+    async def start_rendering(cls):
+        """
+        Start rendering the terminal. Renders at most `frame_rate` frames per second,
+        merging everything that happened between frames into one
+        """
+
+        cls._render_event = asyncio.Event()
+        try:
+            while True:
+                await cls._render_event.wait()
+                cls._render_event.clear()
+                cls.render()
+                await asyncio.sleep(1 / cls.frame_rate)
+        finally:
+            cls._render_event = None
+            cls.render()
+
+    @classmethod
+    def _request_render(cls, lines=False, user_input=False):
+        """
+        Marks parts of the terminal as dirty. Renders right away if the render loop is not running
+        """
+
+        cls._dirty_lines |= lines
+        cls._dirty_input |= user_input
+        if cls._render_event is None:
+            cls.render()
+        else:
+            cls._render_event.set()
+
+    @classmethod
+    def render(cls):
+        """
+        Renders dirty parts of the terminal as one frame
+        """
+
+        if not (cls._dirty_lines or cls._dirty_input):
+            return
+
+        if cls._dirty_lines:
+            cls.update_onscreen_lines()
+        if cls._dirty_input:
+            cls._draw_user_input()
+        cls._dirty_lines = cls._dirty_input = False
+
+        cls._flush_buffer()
+        cls.frames_rendered += 1
 
     @classmethod
     def _insert_user_input(cls, key: str):
@@ -145,7 +287,7 @@ class Terminal:
         cls.user_input.insert(cls.user_cursor, key)
         cls.user_input.pop()
         cls._move_user_cursor(1)
-        cls._update_user_input()
+        cls._request_render(user_input=True)
 
     @classmethod
     def _pop_user_input(cls):
@@ -156,7 +298,7 @@ class Terminal:
         cls.user_input.pop(cls.user_cursor - 1)
         cls._move_user_cursor(-1)
         cls.user_input.append(" ")
-        cls._update_user_input()
+        cls._request_render(user_input=True)
 
     @classmethod
     def _delete_user_input(cls):
@@ -166,7 +308,7 @@ class Terminal:
 
         cls.user_input.pop(cls.user_cursor)
         cls.user_input.append(" ")
-        cls._update_user_input()
+        cls._request_render(user_input=True)
 
     @classmethod
     def _clear_user_input(cls):
@@ -176,7 +318,7 @@ class Terminal:
 
         cls.user_input = [" " for _ in range(cls.term_width)]
         cls.user_cursor = 0
-        cls._update_user_input()
+        cls._request_render(user_input=True)
 
     @classmethod
     def _move_user_cursor(cls, offset: int):
@@ -206,6 +348,7 @@ class Terminal:
         cls._print(f"{TERM_INPUT_FIELD}{'=' * cls.term_width}\n"
                     f"{TERM_INPUT_FIELD}{' ' * cls.term_width}{CS_RESET}", True)
         cls.line_ptr = 0
+        cls._screen = [""] * cls.message_field
 
     @classmethod
     def change_line(cls, offset):
@@ -215,42 +358,240 @@ class Terminal:
 
         old = cls.line_offset
         cls.line_offset += offset
-        cls.line_offset = max(0, min(len(cls.lines) - 6, cls.line_offset))
+        if cls.line_offset < 0 and cls.scroll_top_callback and cls._has_room(1, 1):
+            asyncio.create_task(cls.scroll_top_callback())
+        cls.line_offset = max(0, min(cls.line_count() - 6, cls.line_offset))
         if cls.line_offset != old:
-            cls.update_onscreen_lines()
+            cls._request_render(lines=True)
+
+    @classmethod
+    def line_count(cls) -> int:
+        """
+        Returns total amount of lines in scrollback
+        """
+
+        return cls._line_index.total
 
     @classmethod
     def update_lines(cls):
         """
-        Updates content of every line with new messages
+        Recounts lines of every message (f.e. after terminal width has changed)
         """
 
-        cls.lines.clear()
         for msg in cls.messages:
-            cls.lines += msg.lines()
+            msg.line_count = len(msg.lines())
+        cls._line_index = LineIndex(msg.line_count for msg in cls.messages)
+        cls._first_slot = 0
+        cls._viewport = {}
 
     @classmethod
-    def update_onscreen_lines(cls):
+    def get_lines(cls, start: int, end: int) -> list[str]:
+        """
+        Returns lines in range [start; end). Only messages in that range get wrapped
+        """
+
+        lines = []
+        if start >= end:
+            return lines
+
+        # find first message and wrap messages until the range is filled
+        slot, skip = cls._line_index.find(start)
+        viewport = {}
+        while len(lines) < end - start + skip and slot - cls._first_slot < len(cls.messages):
+            msg_lines = cls._viewport.get(slot)
+            if msg_lines is None:
+                msg_lines = cls.messages[slot - cls._first_slot].lines()
+            viewport[slot] = msg_lines
+            lines += msg_lines
+            slot += 1
+        cls._viewport = viewport
+        return lines[skip:skip + end - start]
+
+    @classmethod
+    def _append_message(cls, message: TerminalMessage):
+        """
+        Appends new message to the scrollback, evicting the oldest messages when it's full.
+        Messages on screen are kept while scrollback is at most one screen over `max_lines`
+        (`max_bytes` is always enforced)
+        """
+
+        old_length = cls.line_count()
+        message.line_count = len(message.lines())
+        message.size = len(message.content.encode("utf-8"))
+        cls.messages.append(message)
+        cls._line_index.append(message.line_count)
+        cls._message_bytes += message.size
+        cls._follow_bottom(old_length)
+
+        # evict oldest messages (always keep the newest one)
+        evicted = []
+        while len(cls.messages) > 1 and not cls._has_room():
+            on_screen = cls._line_index.prefix(cls._first_slot + 1) > cls.line_offset
+            if on_screen and cls._has_room(-cls.message_field):
+                break
+            msg = cls.messages.popleft()
+            cls._line_index.add(cls._first_slot, -msg.line_count)
+            cls._viewport.pop(cls._first_slot, None)
+            cls._first_slot += 1
+            cls._message_bytes -= msg.size
+            evicted.append(msg)
+        if not evicted:
+            return
+
+        # compact the index, once most of it is evicted slots
+        if cls._first_slot > len(cls.messages):
+            cls._line_index = LineIndex(msg.line_count for msg in cls.messages)
+            cls._first_slot = 0
+            cls._viewport = {}
+
+        # keep offsets pointing at the same lines
+        evicted_lines = sum(msg.line_count for msg in evicted)
+        cls.line_offset = max(0, cls.line_offset - evicted_lines)
+        cls._screen_offset -= evicted_lines
+
+        # spill evicted lines to disk
+        if cls.spill_path:
+            with open(cls.spill_path, "a", encoding="utf-8") as file:
+                for msg in evicted:
+                    file.write("\n".join(msg.lines()) + "\n")
+
+    @classmethod
+    def _has_room(cls, lines: int = 0, size: int = 0) -> bool:
         """
-        Updates content of every terminal line (in message field)
+        Returns True if scrollback limits allow adding messages with given amount of lines and bytes
         """
 
-        # move cursor home (0, 0)
-        cls._print("\33[H")
+        if cls.max_lines is not None and cls.line_count() + lines > cls.max_lines:
+            return False
+        if cls.max_bytes is not None and cls._message_bytes + size > cls.max_bytes:
+            return False
+        return True
+
+    @classmethod
+    def update_onscreen_lines(cls):
+        """
+        Updates content of every terminal line (in message field).
+        Only the lines that differ from the shadow copy of the screen are redrawn
+        """
 
         # calculate start and end
         start = cls.line_offset
-        end = min(len(cls.lines), start + cls.message_field)
+        end = min(cls.line_count(), start + cls.message_field)
+
+        # new screen content
+        rows = cls.get_lines(start, end)
+        rows += [""] * (cls.message_field - len(rows))
+
+        # when lines were only shifted, let the terminal scroll them using scroll region
+        frame = []
+        screen = cls._screen
+        shift = start - cls._screen_offset
+        if 0 < shift < cls.message_field and rows[:-shift] == screen[shift:]:
+            frame.append(f"\33[1;{cls.message_field}r\33[{shift}S\33[r")
+            screen = screen[shift:] + [""] * shift
+        elif 0 < -shift < cls.message_field and rows[-shift:] == screen[:shift]:
+            frame.append(f"\33[1;{cls.message_field}r\33[{-shift}T\33[r")
+            screen = [""] * -shift + screen[:shift]
+
+        # redraw damaged lines
+        for y, (new, old) in enumerate(zip(rows, screen)):
+            if new != old:
+                frame.append(f"\33[{y + 1};1H{new}\33[0K")
+
+        # print the frame using synchronized output (prevents tearing)
+        if frame:
+            cls._print(TERM_SYNC_BEGIN + "".join(frame) + TERM_SYNC_END)
+
+        cls._screen = rows
+        cls._screen_offset = start
 
-        # print lines
-        for line in cls.lines[start:end]:
-            cls._print(f"{line}\33[0K\n")
+    @classmethod
+    def _follow_bottom(cls, old_length: int):
+        """
+        Keeps the view at the newest lines, if it was at the bottom before new lines were added
+        """
 
-        # deal with empty lines
-        cls._print("\33[0K\n" * (cls.message_field - (end - start)))
+        if cls.line_offset >= old_length - cls.message_field:
+            cls.line_offset = max(0, cls.line_count() - cls.message_field)
 
-        # flush the print buffer
-        cls._flush_buffer()
+    @classmethod
+    def clear_messages(cls):
+        """
+        Removes all messages from scrollback
+        """
+
+        cls.messages.clear()
+        cls._line_index = LineIndex()
+        cls._first_slot = 0
+        cls._message_bytes = 0
+        cls._viewport = {}
+        cls.line_offset = 0
+        cls._request_render(lines=True)
+
+    @classmethod
+    def prepend_messages(cls, messages: list[Message]) -> int:
+        """
+        Inserts discord messages (oldest first) before all other messages. Used for message history.
+        Only the newest messages that fit into scrollback limits are inserted.
+        Returns amount of inserted messages
+        """
+
+        added_lines = 0
+        added_bytes = 0
+        prepended = []
+        for message in reversed(messages):
+            msg = TerminalMessage(content=format_message(message), reference_message=message)
+            msg.line_count = len(msg.lines())
+            msg.size = len(msg.content.encode("utf-8"))
+            fits = cls._has_room(added_lines + msg.line_count, added_bytes + msg.size)
+            if not fits and (cls.messages or prepended):
+                break
+            prepended.append(msg)
+            added_lines += msg.line_count
+            added_bytes += msg.size
+        if not prepended:
+            return 0
+
+        cls.messages.extendleft(prepended)
+        cls._message_bytes += added_bytes
+
+        # slots of all messages have shifted => rebuild the index
+        cls._line_index = LineIndex(msg.line_count for msg in cls.messages)
+        cls._first_slot = 0
+        cls._viewport = {}
+
+        # keep the view on the same lines, unless everything fits on the screen
+        if cls.line_count() - added_lines > cls.message_field:
+            cls.line_offset += added_lines
+            cls._screen_offset += added_lines
+        else:
+            cls.line_offset = max(0, cls.line_count() - cls.message_field)
+        cls._request_render(lines=True)
+        return len(prepended)
+
+    @classmethod
+    def refresh_messages(cls, update):
+        """
+        Formats discord messages in scrollback again, if they were changed
+        :param update: function called with every discord message, returns True if it changed the message
+        """
+
+        changed = False
+        for slot, msg in enumerate(cls.messages, cls._first_slot):
+            if msg.reference_message is None or not update(msg.reference_message):
+                continue
+            forget_message(msg.reference_message)
+            msg.content = format_message(msg.reference_message)
+            line_count = len(msg.lines())
+            size = len(msg.content.encode("utf-8"))
+            cls._line_index.add(slot, line_count - msg.line_count)
+            cls._message_bytes += size - msg.size
+            msg.line_count = line_count
+            msg.size = size
+            cls._viewport.pop(slot, None)
+            changed = True
+        if changed:
+            cls._request_render(lines=True)
 
     @classmethod
     def print(cls, value):
@@ -259,12 +600,10 @@ class Terminal:
         """
 
         # append new message
-        message = TerminalMessage(content=value.__str__())
-        cls.messages.append(message)
-        cls.lines += message.lines()
+        cls._append_message(TerminalMessage(content=value.__str__()))
 
         # print out newest lines
-        cls.update_onscreen_lines()
+        cls._request_render(lines=True)
 
     @classmethod
     def log(cls, value):
@@ -286,9 +625,7 @@ class Terminal:
         """
 
         # append new message
-        message = TerminalMessage(content=format_message(message), reference_message=message)
-        cls.messages.append(message)
-        cls.lines += message.lines()
+        cls._append_message(TerminalMessage(content=format_message(message), reference_message=message))
 
         # print out newest lines
-        cls.update_onscreen_lines()
+        cls._request_render(lines=True)
@@ -1,10 +1,38 @@
 import re
+import sys
 from enum import Enum, IntFlag, auto
+from bisect import bisect_left, insort
+from collections import OrderedDict
 
 from .constants import *
+from . import snowflake
 from datetime import datetime
 
 
+def _snowflake(value: str | int | None) -> int | None:
+    """
+    Converts snowflake (decimal string in JSON payloads) to int
+    """
+
+    return int(value) if value is not None else None
+
+
+def _intern(value: str | None) -> str | None:
+    """
+    Interns often repeated strings (role and channel names, ...)
+    """
+
+    return sys.intern(value) if value else value
+
+
+def _permissions(value: str | int | None) -> int | None:
+    """
+    Converts permissions (decimal string in JSON payloads) to int bitmask
+    """
+
+    return int(value) if value is not None else None
+
+
 class Permissions(IntFlag):
     """
     Permissions flag enum. Oh god, there are so many
@@ -59,6 +87,27 @@ class Permissions(IntFlag):
     SEND_VOICE_MESSAGES = auto()
 
 
+class Capabilities(IntFlag):
+    """
+    Gateway capabilities (sent in IDENTIFY)
+    """
+
+    LAZY_USER_NOTIFICATIONS = 1 << 0
+    NO_AFFINE_USER_IDS = 1 << 1
+    VERSIONED_READ_STATES = 1 << 2
+    VERSIONED_USER_GUILD_SETTINGS = 1 << 3
+    DEDUPE_USER_OBJECTS = 1 << 4                # READY has "users" list, and channels only have recipient ids
+    PRIORITIZED_READY_PAYLOAD = 1 << 5
+    MULTIPLE_GUILD_EXPERIMENT_POPULATIONS = 1 << 6
+    NON_CHANNEL_READ_STATES = 1 << 7
+    AUTH_TOKEN_REFRESH = 1 << 8
+    USER_SETTINGS_PROTO = 1 << 9
+    CLIENT_STATE_V2 = 1 << 10
+    PASSIVE_GUILD_UPDATE = 1 << 11              # guilds that aren't subscribed (op 14) only get passive updates
+    AUTO_CALL_CONNECT = 1 << 12
+    DEBOUNCE_MESSAGE_REACTIONS = 1 << 13
+
+
 class ChannelType(Enum):
     """
     Channel type enum
@@ -122,6 +171,8 @@ class Role:
     Role class
     """
 
+    __slots__ = ("id", "name", "color", "position", "permissions")
+
     def __init__(self, **kwargs):
         """
         :key id: role id
@@ -131,11 +182,15 @@ class Role:
         :key permissions: role's permissions value
         """
 
-        self.id: str = kwargs.get("id")
-        self.name: str = kwargs.get("name")
+        self.id: int = _snowflake(kwargs.get("id"))
+        self.name: str = _intern(kwargs.get("name"))
         self.color: int = kwargs.get("color")
         self.position: int = kwargs.get("position")
-        self.permissions: Permissions = Permissions(int(kwargs.get("permissions")))
+        self.permissions: int = _permissions(kwargs.get("permissions"))
+
+    @property
+    def permission_flags(self) -> Permissions:
+        return Permissions(self.permissions)
 
 
 class Attachment:
@@ -143,6 +198,8 @@ class Attachment:
     Attachment object class
     """
 
+    __slots__ = ("id", "filename", "size", "url")
+
     def __init__(self, **kwargs):
         """
         :key id: attachment id
@@ -151,7 +208,7 @@ class Attachment:
         :key url: url to attachment
         """
 
-        self.id: str = kwargs.get("id")
+        self.id: int = _snowflake(kwargs.get("id"))
         self.filename: str = kwargs.get("filename")
         self.size: int = kwargs.get("size")
         self.url: str = kwargs.get("url")
@@ -162,6 +219,8 @@ class Member:
     Member class
     """
 
+    __slots__ = ("user", "guild", "nick", "roles", "permissions")
+
     def __init__(self, **kwargs):
         """
         :key user: user reference
@@ -176,8 +235,7 @@ class Member:
         self.guild: Guild | None = None
         self.nick: str | None = kwargs.get("nick")
         self.roles: list[Role] = kwargs.get("roles", list())
-        self.permissions: Permissions | None = Permissions(
-            int(kwargs.get("permissions"))) if "permissions" in kwargs else None
+        self.permissions: int | None = _permissions(kwargs.get("permissions"))
 
         if kwargs.get("guild"):
             self.guild = kwargs["guild"]
@@ -186,12 +244,27 @@ class Member:
         else:
             self.guild = None
 
+    @property
+    def permission_flags(self) -> Permissions | None:
+        return Permissions(self.permissions) if self.permissions is not None else None
+
+    @property
+    def color(self) -> int:
+        """
+        Color of member's highest colored role (0 if none)
+        """
+
+        colored = [role for role in self.roles if role.color]
+        return max(colored, key=lambda x: x.position).color if colored else 0
+
 
 class User:
     """
     Generic user class
     """
 
+    __slots__ = ("id", "username", "global_name", "bot")
+
     def __init__(self, **kwargs):
         """
         :key id: user id
@@ -200,7 +273,7 @@ class User:
         :key bot: is user a bot
         """
 
-        self.id: str = kwargs.get("id")
+        self.id: int = _snowflake(kwargs.get("id"))
         self.username: str = kwargs.get("username")
         self.global_name: str | None = kwargs.get("global_name")
         self.bot: bool = kwargs.get("bot", False)
@@ -211,6 +284,8 @@ class Channel:
     Channel class
     """
 
+    __slots__ = ("id", "guild", "type", "name", "position", "parent_id", "permissions", "recipients", "last_message_id")
+
     def __init__(self, **kwargs):
         """
         :key id: channel id
@@ -220,17 +295,37 @@ class Channel:
         :key position: channel position (if present)
         :key permissions: channels permissions (if present)
         :key recipients: list of recipients (users)
+        :key last_message_id: id of the last message in the channel (if present)
         """
 
-        self.id: str = kwargs.get("id")
+        self.id: int = _snowflake(kwargs.get("id"))
         self.guild: Guild | None = ClientUser.get_guild(kwargs.get("guild_id"))
         self.type: ChannelType = ChannelType(kwargs.get("type"))
-        self.name: str | None = kwargs.get("name")
+        self.name: str | None = _intern(kwargs.get("name"))
         self.position: int = kwargs.get("position", 0)
-        self.parent_id: str | None = kwargs.get("parent_id")
-        self.permissions: Permissions | None = Permissions(
-            int(kwargs.get("permissions"))) if "permissions" in kwargs else None
+        self.parent_id: int | None = _snowflake(kwargs.get("parent_id"))
+        self.permissions: int | None = _permissions(kwargs.get("permissions"))
         self.recipients: list[User] = kwargs.get("recipients", list())
+        self.last_message_id: int | None = _snowflake(kwargs.get("last_message_id"))
+
+    @property
+    def permission_flags(self) -> Permissions | None:
+        return Permissions(self.permissions) if self.permissions is not None else None
+
+    def update(self, other: "Channel"):
+        """
+        Copies fields of updated channel object (keeps references to this one valid)
+        """
+
+        self.type = other.type
+        self.name = other.name
+        self.position = other.position
+        self.parent_id = other.parent_id
+        self.permissions = other.permissions
+        if other.recipients:
+            self.recipients = other.recipients
+        if other.last_message_id is not None:
+            self.last_message_id = other.last_message_id
 
     @staticmethod
     def from_response(response: dict):
@@ -239,25 +334,139 @@ class Channel:
         """
 
         recipients = [
-            User(**x) for x in response.get("recipients", [])
+            ClientUser.add_user(User(**x)) for x in response.get("recipients", [])
         ]
 
         return Channel(
             id=response["id"],  # always present
+            guild_id=response.get("guild_id"),  # may be present
             type=response["type"],  # always present
             name=response.get("name"),  # may be present, nullable
             position=response.get("position", 0),  # may be present
             parent_id=response.get("parent_id"),  # may be present, nullable
             permissions=response.get("permissions"),  # may be present
-            recipients=recipients
+            recipients=recipients,
+            last_message_id=response.get("last_message_id")  # may be present, nullable
         )
 
 
+class ChannelTree:
+    """
+    Ordered channel tree of a guild: categories followed by their channels, each level sorted by position.
+    Changes only touch the sibling list of the channel (binary search). Display order is rebuilt on first read
+    after a change, so looking up channel by its display index is O(1)
+    """
+
+    __slots__ = ("_nodes", "_children", "_keys", "_ordered", "_selectable")
+
+    def __init__(self, channels: list[Channel] = ()):
+        """
+        :param channels: channels in any order
+        """
+
+        self._nodes: dict[int, Channel] = {}                                # channel id -> channel
+        self._children: dict[int | None, list[tuple[int, int]]] = {None: []}  # parent id -> sorted (position, id)
+        self._keys: dict[int, tuple[int | None, tuple[int, int]]] = {}      # channel id -> (parent id, sort key)
+        self._ordered: list[Channel] | None = None
+        self._selectable: list[Channel] | None = None
+
+        # categories first, so their channels can find them
+        for channel in sorted(channels, key=lambda x: x.type != ChannelType.GUILD_CATEGORY):
+            self.add(channel)
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __contains__(self, channel_id: int) -> bool:
+        return channel_id in self._nodes
+
+    def get(self, channel_id: int) -> Channel | None:
+        return self._nodes.get(channel_id)
+
+    def add(self, channel: Channel):
+        """
+        Adds the channel. If the channel is already in the tree, moves it to its new place
+        """
+
+        if channel.id in self._nodes:
+            self._unlink(channel.id)
+        self._nodes[channel.id] = channel
+        self._link(channel)
+        self._ordered = None
+
+    def remove(self, channel_id: int) -> Channel | None:
+        """
+        Removes the channel. Channels of removed category are moved to the top level
+        """
+
+        channel = self._nodes.pop(channel_id, None)
+        if channel is None:
+            return None
+        self._unlink(channel_id)
+        for _, child_id in self._children.pop(channel_id, []):
+            del self._keys[child_id]
+            self._link(self._nodes[child_id])
+        self._ordered = None
+        return channel
+
+    def _link(self, channel: Channel):
+        parent = self._nodes.get(channel.parent_id)
+        parent_id = parent.id if (
+            parent is not None and parent.type == ChannelType.GUILD_CATEGORY and
+            channel.type != ChannelType.GUILD_CATEGORY) else None
+        key = (channel.position, channel.id)
+        insort(self._children.setdefault(parent_id, []), key)
+        self._keys[channel.id] = (parent_id, key)
+
+    def _unlink(self, channel_id: int):
+        parent_id, key = self._keys.pop(channel_id)
+        siblings = self._children[parent_id]
+        del siblings[bisect_left(siblings, key)]
+
+    @property
+    def ordered(self) -> list[Channel]:
+        """
+        All channels in display order
+        """
+
+        if self._ordered is None:
+            self._rebuild()
+        return self._ordered
+
+    @property
+    def selectable(self) -> list[Channel]:
+        """
+        Channels that can be picked (everything except categories), in display order
+        """
+
+        if self._ordered is None:
+            self._rebuild()
+        return self._selectable
+
+    def _rebuild(self):
+        """
+        Rebuilds display order
+        """
+
+        ordered = []
+        for _, channel_id in self._children[None]:
+            ordered.append(self._nodes[channel_id])
+            for _, child_id in self._children.get(channel_id, ()):
+                ordered.append(self._nodes[child_id])
+        self._ordered = ordered
+        self._selectable = [x for x in ordered if x.type != ChannelType.GUILD_CATEGORY]
+
+
 class Guild:
     """
-    Guild class
+    Guild class. Roles and channels given as raw payloads are only built on first access
     """
 
+    __slots__ = (
+        "id", "name", "description", "members", "_raw_roles", "_raw_channels", "_roles", "_role_index", "_tree")
+
+    max_members: int = 5000     # max amount of cached members per guild
+
     def __init__(self, **kwargs):
         """
         :key id: guild id
@@ -265,77 +474,150 @@ class Guild:
         :key description: guild's description (nullable)
         :key roles: guild's role list
         :key channels: list of guild's channels
-        :key members: guild's members
+        :key members: guild's members (cached, least recently used first)
+        :key raw_roles: raw role objects (built lazily, instead of roles)
+        :key raw_channels: raw channel objects (built lazily, instead of channels)
         """
 
-        self.id: str = kwargs.get("id")
+        self.id: int = _snowflake(kwargs.get("id"))
         self.name: str = kwargs.get("name")
         self.description: str | None = kwargs.get("description")
-        self.roles: list[Role] = kwargs.get("roles", list())
-        self.channels: list[Channel] = kwargs.get("channels", list())
-        self.members: list[Member] = kwargs.get("members", list())
+        self.members: OrderedDict[int, Member] = OrderedDict()
+
+        self._raw_roles: list[dict] | None = kwargs.get("raw_roles")
+        self._raw_channels: list[dict] | None = kwargs.get("raw_channels")
+        self._roles: list[Role] | None = None
+        self._role_index: dict[int, Role] = {}
+        self._tree: ChannelTree | None = None
+        if self._raw_roles is None:
+            self.roles = kwargs.get("roles", list())
+        for member in kwargs.get("members", list()):
+            self.add_member(member)
+        if self._raw_channels is None:
+            self._tree = ChannelTree(kwargs.get("channels", list()))
+
+    @property
+    def materialized(self) -> bool:
+        """
+        True if roles and channels were built
+        """
+
+        return self._raw_roles is None and self._raw_channels is None
+
+    @property
+    def roles(self) -> list[Role]:
+        if self._roles is None:
+            self._build_roles()
+        return self._roles
 
-        self._annoying_sort()
+    @roles.setter
+    def roles(self, value: list[Role]):
+        self._roles = value
+        self._raw_roles = None
+        self._role_index = {role.id: role for role in value}
 
-    def _annoying_sort(self):
+    def get_role(self, rid: str | int) -> Role | None:
         """
-        Sorts the channels properly (keeping in mind GUILD_CATEGORY)
+        Returns guild's role by ID. None if there is no such role
         """
 
-        # tree of categories
-        categories = []
+        if self._roles is None:
+            self._build_roles()
+        return self._role_index.get(int(rid))
 
-        # append all categories
-        for channel in self.channels:
-            if channel.type == ChannelType.GUILD_CATEGORY:
-                categories.append(
-                    {
-                        "category": channel,
-                        "items": []})
+    def resolve_roles(self, role_ids: list[str | int]) -> list[Role]:
+        """
+        Returns guild's roles with given IDs (unknown ones are skipped)
+        """
+
+        if self._roles is None:
+            self._build_roles()
+        index = self._role_index
+        return [role for role in (index.get(int(x)) for x in role_ids) if role is not None]
+
+    def get_member(self, uid: str | int) -> Member | None:
+        """
+        Returns cached member by user ID. None if that member isn't cached
+        """
 
-        # append channels to categories
+        uid = int(uid)
+        member = self.members.get(uid)
+        if member is not None:
+            self.members.move_to_end(uid)
+        return member
+
+    def add_member(self, member: Member) -> Member:
+        """
+        Adds member to the cache. If that member is already cached, updates cached one instead
+        """
+
+        uid = member.user.id
+        cached = self.members.get(uid)
+        if cached is not None:
+            cached.user = member.user
+            cached.nick = member.nick
+            cached.roles = member.roles
+            member = cached
+        member.guild = self
+        self.members[uid] = member
+        self.members.move_to_end(uid)
+        while len(self.members) > self.max_members:
+            self.members.popitem(last=False)
+        return member
+
+    def remove_member(self, uid: str | int) -> Member | None:
+        """
+        Removes member from the cache
+        """
+
+        return self.members.pop(int(uid), None)
+
+    @property
+    def channel_tree(self) -> ChannelTree:
+        if self._tree is None:
+            self._build_channels()
+        return self._tree
+
+    @property
+    def channels(self) -> list[Channel]:
+        """
+        Guild's channels in display order
+        """
+
+        return self.channel_tree.ordered
+
+    @channels.setter
+    def channels(self, value: list[Channel]):
+        self._tree = ChannelTree(value)
+        self._raw_channels = None
+
+    def materialize(self):
+        """
+        Builds roles and channels, if they weren't built yet
+        """
+
+        if self._roles is None:
+            self._build_roles()
+        if self._tree is None:
+            self._build_channels()
+
+    def _build_roles(self):
+        self.roles = [Role(**x) for x in self._raw_roles]
+
+    def _build_channels(self):
+        self.channels = [Channel(**x) for x in self._raw_channels]
         for channel in self.channels:
-            # skip category channels
-            if channel.type == ChannelType.GUILD_CATEGORY:
-                continue
+            channel.guild = self
+            ClientUser.index_channel(channel, self)
 
-            # if channels doesn't belong to any category
-            if channel.parent_id is None:
-                categories.append(channel)
+    def channel_ids(self) -> list[int]:
+        """
+        Returns ids of guild's channels, without building them
+        """
 
-            # if it does, find category and append
-            else:
-                for cat in categories:
-                    if not isinstance(cat, dict):
-                        continue
-                    if cat["category"].id == channel.parent_id:
-                        cat["items"].append(channel)
-                        break
-
-        # sort channels inside categories
-        for cat in categories:
-            # skip default channels
-            if isinstance(cat, Channel):
-                continue
-
-            # sort channels inside category
-            cat["items"].sort(key=lambda x: x.position)
-
-        # sort everything
-        categories.sort(key=lambda x: x.position if isinstance(x, Channel) else x["category"].position)
-
-        # make new channel list and assign as a new one
-        new_channels = []
-        for cat in categories:
-            # append channel
-            if isinstance(cat, Channel):
-                new_channels.append(cat)
-
-            # append channels within a category
-            else:
-                new_channels.append(cat["category"])
-                new_channels += cat["items"]
-        self.channels = new_channels
+        if self._tree is None:
+            return [int(x["id"]) for x in self._raw_channels]
+        return [x.id for x in self._tree.ordered]
 
     @staticmethod
     def from_response(response: dict):
@@ -357,63 +639,202 @@ class Guild:
 
 class ClientUser(User):
     """
-    Client user
+    Client user. Also holds the id-keyed entity cache
     """
 
-    known_users: list[User] = []
+    known_users: OrderedDict[int, User] = OrderedDict()     # non-friend users, least recently used first
     known_guilds: list[Guild] = []
     private_channels: list[Channel] = []
     focus_channel: Channel | None = None
+    me: "ClientUser | None" = None                          # currently logged in user
+
+    # entity cache
+    max_users: int = 10000                                  # max amount of cached non-friend users
+    friends: dict[int, User] = {}                           # friends are never evicted
+    _guild_index: dict[int, Guild] = {}                     # guild id -> guild
+    _channel_index: dict[int, Channel] = {}                 # channel id -> channel
+    _channel_guild_index: dict[int, Guild] = {}             # channel id -> guild
+
+    # cache statistics
+    cache_hits: int = 0
+    cache_misses: int = 0
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
     @classmethod
-    def get_user(cls, uid: str) -> User | None:
+    def add_user(cls, user: User, friend: bool = False) -> User:
+        """
+        Adds user to the cache. If that user is already cached, updates cached one instead
+        """
+
+        cached = cls.friends.get(user.id) or cls.known_users.get(user.id)
+        if cached is not None:
+            cached.username = user.username
+            cached.global_name = user.global_name
+            cached.bot = user.bot
+            user = cached
+
+        # friends are kept separately, so they never get evicted
+        if friend:
+            cls.known_users.pop(user.id, None)
+            cls.friends[user.id] = user
+        elif user.id not in cls.friends:
+            cls.known_users[user.id] = user
+            cls.known_users.move_to_end(user.id)
+            while len(cls.known_users) > cls.max_users:
+                cls.known_users.popitem(last=False)
+        return user
+
+    @classmethod
+    def add_guild(cls, guild: Guild):
+        """
+        Adds guild to the cache, and indexes all of its channels.
+        Channels which weren't built yet are only mapped to the guild, and get indexed once built
+        """
+
+        if guild.id not in cls._guild_index:
+            cls.known_guilds.append(guild)
+        else:
+            cls.known_guilds[cls.known_guilds.index(cls._guild_index[guild.id])] = guild
+        cls._guild_index[guild.id] = guild
+
+        for cid in guild.channel_ids():
+            cls._channel_guild_index[cid] = guild
+        if guild.materialized:
+            for channel in guild.channels:
+                channel.guild = guild
+                cls.index_channel(channel, guild)
+
+    @classmethod
+    def upsert_channel(cls, channel: Channel) -> Channel:
+        """
+        Adds new channel (CHANNEL_CREATE), or updates cached one (CHANNEL_UPDATE). Returns the cached channel
+        """
+
+        cached = cls._channel_index.get(channel.id)
+        if cached is not None:
+            cached.update(channel)
+            channel = cached
+        guild = channel.guild or cls._channel_guild_index.get(channel.id)
+
+        if guild is None:
+            cls.add_private_channel(channel)
+        else:
+            channel.guild = guild
+            guild.channel_tree.add(channel)
+            cls.index_channel(channel, guild)
+        return channel
+
+    @classmethod
+    def remove_channel(cls, cid: str | int) -> Channel | None:
+        """
+        Removes channel from the cache (CHANNEL_DELETE)
+        """
+
+        cid = int(cid)
+        guild = cls._channel_guild_index.pop(cid, None)
+        channel = cls._channel_index.pop(cid, None)
+        if guild is not None:
+            channel = guild.channel_tree.remove(cid) or channel
+        elif channel in cls.private_channels:
+            cls.private_channels.remove(channel)
+        return channel
+
+    @classmethod
+    def index_channel(cls, channel: Channel, guild: Guild | None = None):
+        """
+        Adds channel to the channel index
+        """
+
+        cls._channel_index[channel.id] = channel
+        if guild is not None:
+            cls._channel_guild_index[channel.id] = guild
+
+    @classmethod
+    def add_private_channel(cls, channel: Channel):
+        """
+        Adds private channel to the cache
+        """
+
+        if channel.id not in cls._channel_index:
+            cls.private_channels.append(channel)
+        cls._channel_index[channel.id] = channel
+
+    @classmethod
+    def get_user(cls, uid: str | int) -> User | None:
         """
         Returns a user by ID. None if that user doesn't exist
         """
 
-        for user in cls.known_users:
-            if user.id == uid:
-                return user
-        return None
+        uid = _snowflake(uid)
+        user = cls.friends.get(uid)
+        if user is None:
+            user = cls.known_users.get(uid)
+            if user is not None:
+                cls.known_users.move_to_end(uid)
+        cls._count_lookup(user)
+        return user
 
     @classmethod
-    def get_guild(cls, gid: str) -> Guild | None:
+    def get_guild(cls, gid: str | int) -> Guild | None:
         """
         Returns a guild by ID. None if that guild doesn't exist
         """
 
-        for guild in cls.known_guilds:
-            if guild.id == gid:
-                return guild
-        return None
+        if gid is None:
+            return None
+        return cls._count_lookup(cls._guild_index.get(int(gid)))
 
     @classmethod
-    def get_channel(cls, cid: str) -> Channel | None:
+    def get_channel(cls, cid: str | int) -> Channel | None:
         """
         Returns a channel by ID. None if that channel doesn't exist
         """
 
-        # check private channels
-        for channel in cls.private_channels:
-            if channel.id == cid:
-                return channel
+        if cid is None:
+            return None
+        cid = int(cid)
+        channel = cls._channel_index.get(cid)
 
-        # check guild channels
-        for guild in cls.known_guilds:
-            for channel in guild.channels:
-                if channel.id == cid:
-                    return channel
-        return None
+        # channel of a guild that wasn't built yet
+        if channel is None and cid in cls._channel_guild_index:
+            guild = cls._channel_guild_index[cid]
+            if not guild.materialized:
+                guild.materialize()
+                channel = cls._channel_index.get(cid)
+        return cls._count_lookup(channel)
+
+    @classmethod
+    def get_channel_guild(cls, cid: str | int) -> Guild | None:
+        """
+        Returns a guild to which the channel belongs. None for private or unknown channels
+        """
+
+        return cls._channel_guild_index.get(_snowflake(cid))
+
+    @classmethod
+    def _count_lookup(cls, entity):
+        """
+        Updates cache hit / miss counters
+        """
+
+        if entity is None:
+            cls.cache_misses += 1
+        else:
+            cls.cache_hits += 1
+        return entity
 
 
 class Message:
     """
-    Message class
+    Message class. Creation time is derived from the id, edit time is parsed on first access
     """
 
+    __slots__ = (
+        "id", "channel", "author", "content", "type", "_edited_timestamp",
+        "mention_everyone", "mentions", "mention_roles", "attachments")
+
     def __init__(self, **kwargs):
         """
         :key id: message id
@@ -421,28 +842,43 @@ class Message:
         :key author: message's author
         :key content: message's content
         :key type: message type
-        :key timestamp: message creation time
-        :key edited_timestamp: message edit time
+        :key edited_timestamp: message edit time (ISO 8601 string)
         :key mention_everyone: @everyone
         :key mentions: list of user mentioned
         :key mention_roles: list of roles mentioned
         :key attachments: list of attachments
         """
 
-        self.id: str = kwargs.get("id")
+        self.id: int = _snowflake(kwargs.get("id"))
         self.channel: Channel | None = ClientUser.get_channel(kwargs.get("channel_id"))
         self.author: User | Member = kwargs.get("author")
         self.content: str = kwargs.get("content")
         self.type: MessageType = MessageType(int(kwargs.get("type")))
-        self.timestamp: datetime = datetime.fromisoformat(kwargs.get("timestamp"))
-        self.edited_timestamp: datetime = datetime.fromisoformat(
-            kwargs.get("edited_timestamp")) if kwargs.get("edited_timestamp") else None
+        self._edited_timestamp: str | datetime | None = kwargs.get("edited_timestamp")
         self.mention_everyone: bool = kwargs.get("mention_everyone", False)
         self.mentions: list[User] = kwargs.get("mentions", list())
         self.mention_roles: list[Role] = kwargs.get("mention_roles", list())
         self.attachments: list[Attachment] = kwargs.get("attachments", list())
         # self.embeds: list = kwargs.get("embeds", list())  # e
 
+    @property
+    def timestamp(self) -> datetime:
+        """
+        Message creation time (UTC)
+        """
+
+        return snowflake.to_datetime(self.id)
+
+    @property
+    def edited_timestamp(self) -> datetime | None:
+        """
+        Message edit time (UTC). None if the message wasn't edited
+        """
+
+        if isinstance(self._edited_timestamp, str):
+            self._edited_timestamp = datetime.fromisoformat(self._edited_timestamp)
+        return self._edited_timestamp
+
     @staticmethod
     def from_create_event(event_data):
         """
@@ -455,40 +891,41 @@ class Message:
             channel_id=event_data["channel_id"],
             content=event_data["content"],
             type=event_data["type"],
-            timestamp=event_data["timestamp"],
+            edited_timestamp=event_data.get("edited_timestamp"),
             mention_everyone=event_data["mention_everyone"])
 
-        # check if author is already known
-        if event_data["author"]["id"] in ClientUser.known_users:
-            author = ClientUser.get_user(event_data["author"]["id"])
+        # check if author is already known (and refresh it)
+        author_raw = event_data["author"]
+        author = ClientUser.get_user(author_raw["id"])
+        if author is not None:
+            author.username = author_raw["username"]
+            author.global_name = author_raw["global_name"]
 
         # otherwise make new user
         else:
-            author = User(
-                id=event_data["author"]["id"],
-                username=event_data["author"]["username"],
-                global_name=event_data["author"]["global_name"],
-                bot=event_data["author"].get("bot"))
-            ClientUser.known_users.append(author)
+            author = ClientUser.add_user(User(
+                id=author_raw["id"],
+                username=author_raw["username"],
+                global_name=author_raw["global_name"],
+                bot=author_raw.get("bot", False)))
 
         # if this is in a guild
-        if event_data.get("member"):
-            # fetch guild
-            guild = ClientUser.get_guild(event_data["guild_id"])
-
-            # fetch roles
-            roles = []
-            # go through all guild roles
-            for role in guild.roles:
-                # if that role is present => add to the list
-                if role.id in event_data["member"]["roles"]:
-                    roles.append(role)
-
-            message.author = Member(
-                user=author,
-                guild=guild,
-                nick=event_data["member"]["nick"],
-                roles=roles)
+        guild = message.channel.guild if message.channel else ClientUser.get_guild(event_data.get("guild_id"))
+        member_raw = event_data.get("member")
+        if guild is not None and member_raw:
+            # refresh cached member (roles are resolved by id)
+            roles = guild.resolve_roles(member_raw.get("roles", ()))
+            member = guild.get_member(author.id)
+            if member is None:
+                member = guild.add_member(Member(user=author, nick=member_raw.get("nick"), roles=roles))
+            else:
+                member.nick = member_raw.get("nick")
+                member.roles = roles
+            message.author = member
+
+        # no member info (f.e. message from history) => use cached member, if there is one
+        elif guild is not None:
+            message.author = guild.get_member(author.id) or author
 
         else:
             message.author = author